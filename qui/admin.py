@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+''' Cached access to `qubesadmin` objects for the domains and devices known
+to the D-Bus models.
+
+Looking up a domain in `qubesadmin.Qubes.domains` can result in an Admin API
+call. The objects are memoized by the object path of their D-Bus model and
+dropped when the domain or device is added or removed.
+'''
+
+import qubesadmin
+import qubesadmin.devices
+
+from typing import Any, Dict, Tuple  # pylint: disable=unused-import
+
+import qui.models.qubes
+
+
+class CachedQubes():
+    ''' Facade over `qubesadmin.Qubes` memoizing the `QubesVM` objects, their
+        device collections and the device assignments.
+
+        `hits` and `misses` count the lookups answered from the cache and the
+        ones which had to go to `qubesadmin`.
+    '''
+
+    def __init__(self, app: qubesadmin.Qubes,
+                 registry: 'qui.models.qubes.Registry') -> None:
+        self.app = app
+        self.registry = registry
+        self._vms = {}  # type: Dict[str, qubesadmin.vm.QubesVM]
+        self._collections = {}  # type: Dict[Tuple[str, str], Any]
+        self._assignments = {}  # type: Dict[str, Any]
+        self.hits = 0
+        self.misses = 0
+
+        domains = registry.domains
+        domains.connect_to_signal('DomainAdded', self._domain_changed)
+        domains.connect_to_signal('DomainRemoved', self._domain_changed)
+        devices = registry.devices
+        devices.connect_to_signal('Added', self._device_changed)
+        devices.connect_to_signal('Removed', self._device_changed)
+
+    def vm(self, vm_obj_path: str) -> qubesadmin.vm.QubesVM:
+        ''' Returns the `QubesVM` for the domain at `vm_obj_path` '''
+        # pylint: disable=invalid-name
+        name = self.registry.domains.children[vm_obj_path]['name']
+        vm = self._vms.get(vm_obj_path)
+        # `QubesVM.name` is a plain attribute, this catches renamed domains
+        if vm is not None and vm.name == name:
+            self.hits += 1
+            return vm
+        self.misses += 1
+        self._forget_vm(vm_obj_path)
+        vm = self._vms[vm_obj_path] = self.app.domains[name]
+        return vm
+
+    def devices(self, vm_obj_path: str, dev_class: str) -> Any:
+        ''' Returns the `DeviceCollection` of class `dev_class` of the domain
+            at `vm_obj_path`
+        '''
+        vm = self.vm(vm_obj_path)
+        key = (vm_obj_path, dev_class)
+        collection = self._collections.get(key)
+        if collection is None:
+            collection = self._collections[key] = vm.devices[dev_class]
+        return collection
+
+    def assignment(self, dev_obj_path: str
+                  ) -> qubesadmin.devices.DeviceAssignment:
+        ''' Returns a non persistent `DeviceAssignment` for the device at
+            `dev_obj_path`
+        '''
+        assignment = self._assignments.get(dev_obj_path)
+        if assignment is None:
+            dev = self.registry.devices.children[dev_obj_path]
+            backend_vm = self.vm(dev['backend_domain'])
+            assignment = qubesadmin.devices.DeviceAssignment(
+                backend_vm, dev['ident'], persistent=False)
+            self._assignments[dev_obj_path] = assignment
+        return assignment
+
+    def _forget_vm(self, vm_obj_path: str) -> None:
+        if self._vms.pop(vm_obj_path, None) is None:
+            return
+        for key in [key for key in self._collections if key[0] == vm_obj_path]:
+            del self._collections[key]
+        # assignments reference the backend domain object
+        devices = self.registry.devices
+        for dev_obj_path in devices.by_backend.get(vm_obj_path):
+            self._assignments.pop(dev_obj_path, None)
+
+    def _domain_changed(self, _, vm_obj_path: str) -> None:
+        # `VMCollection` keeps its list of domains until the cache is
+        # cleared, new domains wouldn't be found otherwise
+        self.app.domains.clear_cache()
+        self._forget_vm(vm_obj_path)
+
+    def _device_changed(self, dev_obj_path: str) -> None:
+        self._assignments.pop(dev_obj_path, None)
+
+
+_CACHES = {}  # type: Dict[Any, CachedQubes]
+
+
+def cached_qubes(registry: 'qui.models.qubes.Registry'=None) -> CachedQubes:
+    ''' Returns the process wide `CachedQubes` for `registry`, by default the
+        one of the session bus. It is created on first use.
+    '''
+    if registry is None:
+        registry = qui.models.qubes.registry()
+    try:
+        return _CACHES[registry]
+    except KeyError:
+        result = _CACHES[registry] = CachedQubes(qubesadmin.Qubes(), registry)
+        return result
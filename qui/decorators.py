@@ -6,13 +6,102 @@ containing helpful representation methods.
 import gi  # isort:skip
 import dbus
 gi.require_version('Gtk', '3.0')  # isort:skip
-from gi.repository import Gtk, Pango  # isort:skip
+from gi.repository import Gdk, GdkPixbuf, GLib, Gtk, Pango  # isort:skip
 
 import qubesadmin
 import qui.models.qubes
 from qui.models.qubes import Device, Domain
 
-LABELS = qui.models.qubes.LabelsManager()
+from typing import Any, Dict, Tuple  # pylint: disable=unused-import
+
+ICON_SIZE = 16
+
+
+class IconCache():
+    ''' Process wide cache of the icon pixbufs, shared by all `Gtk.Image`
+        widgets showing the same icon. Themed icons are keyed by name, size
+        and scale factor and are dropped when the icon theme changes.
+
+        `hits` and `misses` count the lookups answered from the cache and the
+        ones which had to load the icon.
+    '''
+
+    def __init__(self, theme: Gtk.IconTheme=None) -> None:
+        self._theme = None  # type: Gtk.IconTheme
+        if theme is not None:
+            self._set_theme(theme)
+        self._icons = {}  # type: Dict[Tuple[str, int, int], GdkPixbuf.Pixbuf]
+        self._surfaces = {}  # type: Dict[Tuple[str, int, int], Any]
+        self._files = {}  # type: Dict[str, GdkPixbuf.Pixbuf]
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def theme(self) -> Gtk.IconTheme:
+        ''' The icon theme the icons are loaded from, by default the one of
+            the default screen
+        '''
+        if self._theme is None:
+            self._set_theme(Gtk.IconTheme.get_default())
+        return self._theme
+
+    def _set_theme(self, theme: Gtk.IconTheme) -> None:
+        self._theme = theme
+        theme.connect('changed', self._theme_changed)
+
+    def load(self, name: str, size: int=ICON_SIZE,
+             scale: int=1) -> GdkPixbuf.Pixbuf:
+        ''' Returns the pixbuf of the themed icon `name` '''
+        key = (str(name), size, scale)
+        pixbuf = self._icons.get(key)
+        if pixbuf is None:
+            self.misses += 1
+            pixbuf = self.theme.load_icon_for_scale(key[0], size, scale, 0)
+            self._icons[key] = pixbuf
+        else:
+            self.hits += 1
+        return pixbuf
+
+    def load_surface(self, name: str, size: int=ICON_SIZE,
+                     scale: int=1) -> Any:
+        ''' Returns the themed icon `name` as a `cairo.Surface` with the
+            device scale `scale`, it is shown `size` logical pixels large.
+        '''
+        key = (str(name), size, scale)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            # counts the lookup as a hit or miss of the pixbuf
+            surface = Gdk.cairo_surface_create_from_pixbuf(
+                self.load(name, size, scale), scale, None)
+            self._surfaces[key] = surface
+        else:
+            self.hits += 1
+        return surface
+
+    def load_file(self, path: str) -> GdkPixbuf.Pixbuf:
+        ''' Returns the pixbuf of the image file at `path` '''
+        pixbuf = self._files.get(path)
+        if pixbuf is None:
+            self.misses += 1
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+            self._files[path] = pixbuf
+        else:
+            self.hits += 1
+        return pixbuf
+
+    def clear(self) -> None:
+        ''' Drop the cached themed icons '''
+        self._icons.clear()
+        self._surfaces.clear()
+
+    def _theme_changed(self, _theme):
+        self.clear()
+
+    def __len__(self):
+        return len(self._icons) + len(self._files)
+
+
+ICONS = IconCache()
 
 
 class PropertiesDecorator():
@@ -46,21 +135,20 @@ class DomainDecorator(PropertiesDecorator):
 
     def memory(self) -> Gtk.Label:
         label = Gtk.Label(
-            str(int(self.obj['memory_usage'] / 1024)) + ' MB', xalign=0)
+            str(self.obj['memory_usage'] // 1024) + ' MB', xalign=0)
         self.set_margins(label)
         label.set_sensitive(False)
         return label
 
     def icon(self) -> Gtk.Image:
         ''' Returns a `Gtk.Image` containing the colored lock icon '''
+        labels = qui.models.qubes.registry().labels
         label_path = self.obj['label']
-        assert label_path in LABELS.children
-        label = LABELS.children[label_path]
+        assert label_path in labels.children
+        label = labels.children[label_path]
         if label is None:
-            label = LABELS.BLACK  # pylint: disable=no-member
-        icon_vm = Gtk.IconTheme.get_default().load_icon(label['icon'], 16, 0)
-        icon_img = Gtk.Image.new_from_pixbuf(icon_vm)
-        return icon_img
+            label = labels.BLACK  # pylint: disable=no-member
+        return create_icon(label['icon'])
 
     def netvm(self) -> Gtk.Label:
         netvm = self.obj['netvm']
@@ -111,7 +199,32 @@ def device_domain_hbox(vm: Domain, attached: bool) -> Gtk.Box:
     return hbox
 
 
-def create_icon(name: dbus.String) -> Gtk.Image:
-    ''' Create an icon from string '''
-    icon_dev = Gtk.IconTheme.get_default().load_icon(name, 16, 0)
-    return Gtk.Image.new_from_pixbuf(icon_dev)
+def screen_scale() -> int:
+    ''' Returns the scale factor of the primary monitor of the default
+        screen
+    '''
+    screen = Gdk.Screen.get_default()
+    if screen is None:
+        return 1
+    return screen.get_monitor_scale_factor(screen.get_primary_monitor())
+
+
+def create_icon(name: dbus.String, scale: int=None) -> Gtk.Image:
+    ''' Create an icon from string. It is rendered for the `scale` factor,
+        by default the one of `screen_scale()`.
+    '''
+    if scale is None:
+        scale = screen_scale()
+    if scale == 1:
+        return Gtk.Image.new_from_pixbuf(ICONS.load(name))
+    return Gtk.Image.new_from_surface(ICONS.load_surface(name, scale=scale))
+
+
+def create_icon_from_file(path: str) -> Gtk.Image:
+    ''' Create an icon from an image file, a "broken image" icon is shown if
+        the file can not be loaded.
+    '''
+    try:
+        return Gtk.Image.new_from_pixbuf(ICONS.load_file(path))
+    except GLib.Error:
+        return Gtk.Image.new_from_file(path)
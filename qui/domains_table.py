@@ -6,6 +6,9 @@ from __future__ import print_function
 
 import signal
 
+import qui.profiling  # first, to measure the import time
+
+# pylint: disable=wrong-import-position
 import qubesadmin
 import qubesadmin.tools.qvm_ls
 
@@ -62,18 +65,25 @@ class ListBoxWindow(Gtk.Window):
 
 
 def main(args=None):  # pylint:disable=unused-argument
+    profile = qui.profiling.StartupProfile()
+    profile.imports_done()
     parser = qubesadmin.tools.qvm_ls.get_parser()
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the duration of the startup phases')
     try:
         args = parser.parse_args()
     except qubesadmin.exc.QubesException as e:
         parser.print_error(e.message)
         return 1
-    window = ListBoxWindow(args)
+    profile.enabled = args.profile_startup
+    with profile.phase('model build'):
+        window = ListBoxWindow(args)
     window.connect("delete-event", Gtk.main_quit)
     w_file = Gio.File.new_for_path("/var/lib/qubes/qubes.xml")
     monitor = w_file.monitor_file(Gio.FileMonitorFlags.NONE, None)
     monitor.connect("changed", window.reload)
     window.show_all()
+    profile.first_render(profile.report)
     Gtk.main()
 
 
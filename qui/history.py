@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+''' Fixed size histories of numeric samples, e.g. the memory usage of a
+domain, and their rendering as unicode sparklines.
+'''
+
+import array
+
+from typing import Iterable, Iterator  # pylint: disable=unused-import
+
+DEFAULT_CAPACITY = 60
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+class RingBuffer():
+    ''' The last `capacity` samples, stored in an `array.array` of unsigned
+        64 bit integers. Appending overwrites the oldest sample once the
+        buffer is full, the memory used doesn't grow.
+    '''
+
+    def __init__(self, capacity: int=DEFAULT_CAPACITY) -> None:
+        assert capacity > 0
+        self.capacity = capacity
+        self._samples = array.array('Q', bytes(8 * capacity))
+        self._start = 0
+        self._len = 0
+
+    def append(self, value: int) -> None:
+        ''' Add the newest sample '''
+        end = self._start + self._len
+        if self._len < self.capacity:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+        self._samples[end % self.capacity] = value
+
+    def last(self) -> int:
+        ''' Returns the newest sample '''
+        if not self._len:
+            raise IndexError('empty RingBuffer')
+        return self._samples[(self._start + self._len - 1) % self.capacity]
+
+    def max(self) -> int:
+        ''' Returns the largest sample '''
+        if not self._len:
+            raise IndexError('empty RingBuffer')
+        return max(self)
+
+    def clear(self) -> None:
+        ''' Remove all samples '''
+        self._start = 0
+        self._len = 0
+
+    def __iter__(self) -> Iterator[int]:
+        ''' Iterate from the oldest to the newest sample '''
+        for index in range(self._start, self._start + self._len):
+            yield self._samples[index % self.capacity]
+
+    def __len__(self):
+        return self._len
+
+
+def sparkline(values: Iterable[int], width: int=None) -> str:
+    ''' Returns the last `width` values as a string of unicode block
+        characters, scaled between the smallest and largest of them.
+    '''
+    values = list(values)
+    if width is not None:
+        values = values[-width:]
+    if not values:
+        return ''
+    low = min(values)
+    high = max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return ''.join(SPARK_CHARS[int(round((value - low) * scale))]
+                   for value in values)
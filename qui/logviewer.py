@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+''' A window following the log files of a domain in `/var/log/qubes`.
+
+The file is opened at its tail: the start of the last lines is found by
+scanning a memory map of the file backwards, so even large logs open
+without reading them. Afterwards the file is read asynchronously with Gio
+and appended data is followed through a file monitor. Only the last
+`max_lines` lines are kept.
+'''
+
+import collections
+import logging
+import mmap
+import os
+
+from typing import Dict, List  # pylint: disable=unused-import
+
+import gi  # isort:skip
+gi.require_version('Gtk', '3.0')  # isort:skip
+from gi.repository import Gio, GLib, Gtk  # isort:skip
+
+LOG_DIR = '/var/log/qubes'
+DEFAULT_MAX_LINES = 5000
+READ_SIZE = 64 * 1024
+
+_LOG = logging.getLogger(__name__)
+
+
+def log_path(log_name: str, vm_name: str) -> str:
+    ''' Path of the log `log_name` (e.g. "console", "guid" or "qrexec") of
+        the domain `vm_name`
+    '''
+    return os.path.join(LOG_DIR, '%s.%s.log' % (log_name, vm_name))
+
+
+def tail_offset(path: str, lines: int) -> int:
+    ''' Returns the offset of the first of the last `lines` lines of the
+        file at `path`
+    '''
+    with open(path, 'rb') as log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        if size == 0:
+            return 0
+        with mmap.mmap(log_file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as log_map:
+            end = size
+            if log_map[end - 1:end] == b'\n':
+                end -= 1  # the newline ending the last line
+            for _ in range(lines):
+                end = log_map.rfind(b'\n', 0, end)
+                if end == -1:
+                    return 0
+            return end + 1
+
+
+class LogViewer(Gtk.Window):
+    ''' Shows the last `max_lines` lines of the file at `path` and follows
+        the lines appended to it.
+    '''
+
+    def __init__(self, path: str, title: str=None,
+                 max_lines: int=DEFAULT_MAX_LINES) -> None:
+        super(LogViewer, self).__init__(title=title or path)
+        self.path = path
+        self.max_lines = max_lines
+        #: the lines shown, the oldest are dropped first
+        self.lines = collections.deque(
+            maxlen=max_lines)  # type: collections.deque
+        self._partial = b''
+        # whether `_partial` is shown as the last line, until it is complete
+        self._partial_shown = False
+        self._position = 0
+        self._stream = None  # type: Gio.FileInputStream
+        self._reading = False
+        self._changed = False
+        self._cancellable = Gio.Cancellable()
+        self._file = Gio.File.new_for_path(path)
+
+        self.set_default_size(800, 500)
+        self.textview = Gtk.TextView(editable=False, cursor_visible=False,
+                                     monospace=True)
+        self.buffer = self.textview.get_buffer()
+        self._end_mark = self.buffer.create_mark(
+            None, self.buffer.get_end_iter(), False)
+        self.scrolled = Gtk.ScrolledWindow()
+        self.scrolled.add(self.textview)
+        self.add(self.scrolled)
+
+        self._monitor = self._file.monitor_file(Gio.FileMonitorFlags.NONE,
+                                                None)
+        self._monitor.connect('changed', self._file_changed)
+        self.connect('destroy', self._destroyed)
+        self._open(self._start_offset())
+
+    def _start_offset(self) -> int:
+        try:
+            return tail_offset(self.path, self.max_lines)
+        except (OSError, ValueError) as error:
+            _LOG.warning('Failed to scan %s: %s', self.path, error)
+            return 0
+
+    def _open(self, offset: int) -> None:
+        ''' (Re)open the file and read it from `offset` '''
+        self._stream = None
+        self._partial = b''
+        self._partial_shown = False  # keep it as a line of the old file
+        self._position = offset
+        self._reading = True
+        self._file.read_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                              self._opened, self._cancellable)
+
+    def _opened(self, log_file, result, cancellable):
+        if cancellable is not self._cancellable:
+            return  # reopened in the meantime
+        try:
+            self._stream = log_file.read_finish(result)
+            if self._position:
+                self._stream.seek(self._position, GLib.SeekType.SET,
+                                  self._cancellable)
+        except GLib.Error as error:
+            self._reading = False
+            if not error.matches(Gio.io_error_quark(),
+                                 Gio.IOErrorEnum.CANCELLED):
+                self._append_lines(['Failed to open %s: %s' % (
+                    self.path, error.message)])
+            return
+        self._read()
+
+    def _read(self) -> None:
+        self._reading = True
+        self._changed = False
+        self._stream.read_bytes_async(READ_SIZE, GLib.PRIORITY_DEFAULT,
+                                      self._cancellable, self._data_read,
+                                      self._cancellable)
+
+    def _data_read(self, stream, result, cancellable):
+        if cancellable is not self._cancellable:
+            return  # reopened in the meantime
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as error:
+            self._reading = False
+            if not error.matches(Gio.io_error_quark(),
+                                 Gio.IOErrorEnum.CANCELLED):
+                _LOG.warning('Failed to read %s: %s', self.path, error)
+            return
+
+        if data:
+            self._position += len(data)
+            self._add_data(data)
+            self._read()
+        elif self._changed:
+            # appended while the last chunk was read
+            self._read()
+        else:
+            self._reading = False
+            # e.g. a login prompt, replaced once more data is appended
+            self._show_partial()
+
+    def _add_data(self, data: bytes) -> None:
+        self._hide_partial()
+        chunks = (self._partial + data).split(b'\n')
+        self._partial = chunks.pop()
+        if chunks:
+            self._append_lines([chunk.decode('utf-8', errors='replace')
+                                for chunk in chunks])
+
+    def _show_partial(self) -> None:
+        ''' Show the last line even though it has no newline yet '''
+        if self._partial and not self._partial_shown:
+            self._append_lines([self._partial.decode('utf-8',
+                                                     errors='replace')])
+            self._partial_shown = True
+
+    def _hide_partial(self) -> None:
+        ''' Remove the line added by `_show_partial()` '''
+        if not self._partial_shown:
+            return
+        self._partial_shown = False
+        if self.lines:
+            self.lines.pop()
+        end = self.buffer.get_end_iter()
+        start = end.copy()
+        start.set_line_offset(0)
+        if start.get_line() > 0:
+            start.backward_char()  # the newline in front of it
+        self.buffer.delete(start, end)
+
+    def _at_bottom(self) -> bool:
+        ''' Whether the view is scrolled to the end '''
+        adjustment = self.scrolled.get_vadjustment()
+        return (adjustment.get_value() + adjustment.get_page_size()
+                >= adjustment.get_upper() - 1)
+
+    def _append_lines(self, lines: List[str]) -> None:
+        ''' Append `lines` to the buffer, dropping the oldest ones. The view
+            follows the new lines only if it was at the end before.
+        '''
+        follow = self._at_bottom()
+        lines = lines[-self.max_lines:]
+        self.lines.extend(lines)
+        text = '\n'.join(lines)
+        if self.buffer.get_char_count():
+            text = '\n' + text
+        self.buffer.insert(self.buffer.get_end_iter(), text)
+
+        excess = self.buffer.get_line_count() - self.max_lines
+        if excess > 0:
+            self.buffer.delete(self.buffer.get_start_iter(),
+                               self.buffer.get_iter_at_line(excess))
+
+        if follow:
+            self.buffer.move_mark(self._end_mark, self.buffer.get_end_iter())
+            self.textview.scroll_mark_onscreen(self._end_mark)
+
+    def _file_changed(self, _monitor, _file, _other_file, event_type):
+        if event_type in (Gio.FileMonitorEvent.DELETED,
+                          Gio.FileMonitorEvent.MOVED_OUT):
+            return
+        if event_type == Gio.FileMonitorEvent.CREATED:
+            # log rotation, follow the new file from its beginning
+            self._reopen()
+            return
+        if event_type != Gio.FileMonitorEvent.CHANGED:
+            return
+
+        try:
+            size = os.stat(self.path).st_size
+        except OSError:
+            return
+        if size < self._position:
+            # truncated
+            self._reopen()
+        elif self._reading:
+            self._changed = True
+        elif self._stream is not None:
+            self._read()
+
+    def _reopen(self) -> None:
+        self._cancellable.cancel()
+        self._cancellable = Gio.Cancellable()
+        self._open(0)
+
+    def _destroyed(self, _window) -> None:
+        self._cancellable.cancel()
+        self._monitor.cancel()
+        _VIEWERS.pop(self.path, None)
+
+
+_VIEWERS = {}  # type: Dict[str, LogViewer]
+
+
+def show_log(log_name: str, vm_name: str) -> LogViewer:
+    ''' Show the log `log_name` of the domain `vm_name`, reusing the window
+        if it is open already.
+    '''
+    path = log_path(log_name, vm_name)
+    viewer = _VIEWERS.get(path)
+    if viewer is None:
+        viewer = _VIEWERS[path] = LogViewer(
+            path, title='%s.%s.log' % (log_name, vm_name))
+        viewer.show_all()
+    viewer.present()
+    return viewer
@@ -22,17 +22,26 @@
 
 import collections
 import functools
+import logging
 import xml.dom.minidom
 
 import dbus
+import dbus.bus
+import dbus.connection
 
 import qui.models.base
-from typing import Any, Callable, Dict, Union
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, List, Set,
+                    Tuple, Union)
 
+from gi.repository import GLib  # isort:skip
+
+INTROSPECTABLE_INTERFACE = 'org.freedesktop.DBus.Introspectable'
 OBJECT_MANAGER_INTERFACE = 'org.freedesktop.DBus.ObjectManager'
 PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
 PROPERTIES_CHANGED = 'PropertiesChanged'
 
+_LOG = logging.getLogger(__name__)
+
 _DictKey = Union[str, dbus.String]  # pylint: disable=invalid-name,no-member
 
 
@@ -53,42 +62,336 @@ class Interface(qui.models.base.Interface):
         super(Interface, self).__init__(name, methods, signals)
 
 
+class Interfaces(dict):
+    ''' The `Interface` objects of a D-Bus object by name.
+
+        The `methods` attribute maps each method name to the name of the
+        interface providing it.
+    '''
+
+    def __init__(self, interfaces: Iterable[Interface]) -> None:
+        super(Interfaces, self).__init__(
+            (iface.name, iface) for iface in interfaces)
+        self.methods = {
+            method: iface.name
+            for iface in interfaces for method in iface.methods.keys()
+        }  # type: Dict[str, str]
+
+
+class IntrospectionCache(object):
+    ''' Shares the parsed `Interface` tables between models.
+
+        Entries are keyed by the bus name and the interface signature of an
+        object, i.e. the sorted names of the interfaces it implements. All the
+        children of an `ObjectManager` with the same signature are introspected
+        only once.
+    '''
+
+    def __init__(self) -> None:
+        super(IntrospectionCache, self).__init__()
+        self._entries = {}  # type: Dict[Tuple[str, Tuple[str, ...]], Interfaces]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bus: dbus.bus.BusConnection, bus_name: str,
+            object_path: str, signature: Iterable[str]) -> Interfaces:
+        ''' Returns the interfaces for the object, introspecting it only if no
+            object with the same signature was seen on its bus before.
+        '''
+        key = (str(bus_name), tuple(sorted(str(i) for i in signature)))
+        try:
+            interfaces = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            interfaces = introspect(bus, bus_name, object_path)
+            self._entries[key] = interfaces
+        else:
+            self.hits += 1
+        return interfaces
+
+    def clear(self) -> None:
+        ''' Forget all cached entries, e.g. after a service restart '''
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+INTROSPECTION_CACHE = IntrospectionCache()
+
+
+class RefreshQueue(object):
+    ''' Fetches the invalidated properties of `Properties` objects once per
+        main loop iteration, with one asynchronous `GetAll` call per object,
+        and passes the new values to the `PropertiesChanged` subscribers of
+        the object.
+    '''
+
+    def __init__(self) -> None:
+        super(RefreshQueue, self).__init__()
+        self._pending = collections.OrderedDict(
+        )  # type: Dict[int, Properties]
+        self._source = None  # type: int
+
+    def add(self, properties: 'Properties') -> None:
+        ''' Refresh `properties` from the next idle callback '''
+        self._pending[id(properties)] = properties
+        if self._source is None:
+            self._source = GLib.idle_add(self._flush)
+
+    def discard(self, properties: 'Properties') -> None:
+        ''' Don't refresh `properties`, e.g. because it was refreshed already
+        '''
+        self._pending.pop(id(properties), None)
+
+    def _flush(self) -> bool:
+        self._source = None
+        pending, self._pending = self._pending, collections.OrderedDict()
+        for properties in pending.values():
+            properties._refresh_invalidated()  # pylint: disable=protected-access
+        return False  # remove the GLib source
+
+    def __len__(self):
+        return len(self._pending)
+
+
+REFRESH_QUEUE = RefreshQueue()
+
+
+class Subscription(object):
+    ''' A handle for a callback registered in a `PropertiesDispatcher` '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, dispatcher: 'PropertiesDispatcher', bus_name: str,
+                 object_path: str, callback: Callable) -> None:
+        super(Subscription, self).__init__()
+        self.dispatcher = dispatcher
+        self.bus_name = bus_name
+        self.object_path = object_path
+        self.callback = callback
+
+    def remove(self) -> None:
+        ''' Stop delivering signals to the callback '''
+        self.dispatcher.unsubscribe(self)
+
+
+class PropertiesDispatcher(object):
+    ''' Delivers `PropertiesChanged` signals of a bus to the subscribed
+        callbacks by object path.
+
+        Only a single match rule is added per bus name, the object path of a
+        signal is passed in through the `path_keyword`.
+    '''
+
+    def __init__(self, bus: dbus.bus.BusConnection) -> None:
+        super(PropertiesDispatcher, self).__init__()
+        self.bus = bus
+        self._matches = {}  # type: Dict[str, dbus.connection.SignalMatch]
+        self._routes = {}  # type: Dict[str, Dict[str, List[Subscription]]]
+
+    @property
+    def rules(self) -> int:
+        ''' Number of match rules registered on the bus '''
+        return len(self._matches)
+
+    @property
+    def subscribers(self) -> int:
+        ''' Number of subscribed callbacks '''
+        return sum(len(subscriptions)
+                   for paths in self._routes.values()
+                   for subscriptions in paths.values())
+
+    def subscribe(self, bus_name: str, object_path: str,
+                  callback: Callable) -> Subscription:
+        ''' Call `callback(interface, changed, invalidated)` whenever the
+            properties of the object change.
+        '''
+        bus_name = str(bus_name)
+        if bus_name not in self._matches:
+            self._routes[bus_name] = {}
+            self._matches[bus_name] = self.bus.add_signal_receiver(
+                self._dispatcher(bus_name), signal_name=PROPERTIES_CHANGED,
+                dbus_interface=PROPERTIES_INTERFACE, bus_name=bus_name,
+                path_keyword='path')
+
+        subscription = Subscription(self, bus_name, str(object_path), callback)
+        paths = self._routes[bus_name]
+        paths.setdefault(subscription.object_path, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        ''' Remove the `subscription` and the match rule if it was the last one
+            for its bus name.
+        '''
+        paths = self._routes.get(subscription.bus_name, {})
+        subscriptions = paths.get(subscription.object_path, [])
+        if subscription not in subscriptions:
+            return
+        subscriptions.remove(subscription)
+        if not subscriptions:
+            del paths[subscription.object_path]
+        if not paths:
+            del self._routes[subscription.bus_name]
+            self._matches.pop(subscription.bus_name).remove()
+
+    def dispatch(self, bus_name: str, object_path: str, interface: str,
+                 changed_properties: Dict[str, Any],
+                 invalidated: List[str]) -> None:
+        ''' Call the callbacks subscribed to the object as if it sent a
+            `PropertiesChanged` signal
+        '''
+        paths = self._routes.get(str(bus_name), {})
+        self._deliver(paths, str(object_path), interface, changed_properties,
+                      invalidated)
+
+    def _dispatcher(self, bus_name: str) -> Callable:
+        ''' Returns the signal handler for all objects of `bus_name` '''
+        paths = self._routes[bus_name]
+
+        def _dispatch(interface, changed_properties, invalidated, path=None):
+            self._deliver(paths, path, interface, changed_properties,
+                          invalidated)
+
+        return _dispatch
+
+    @staticmethod
+    def _deliver(paths: Dict[str, List[Subscription]], path: str,
+                 interface: str, changed_properties: Dict[str, Any],
+                 invalidated: List[str]) -> None:
+        ''' Call the callbacks subscribed to `path` '''
+        # Copy the list, callbacks may unsubscribe while being called
+        for subscription in list(paths.get(path, ())):
+            # like dbus-python does for every receiver, a failing callback
+            # must not keep the signal from the other ones
+            try:
+                subscription.callback(interface, changed_properties,
+                                      invalidated)
+            except Exception:  # pylint: disable=broad-except
+                _LOG.exception('PropertiesChanged callback for %s failed',
+                               path)
+
+
+_DISPATCHERS = {}  # type: Dict[dbus.bus.BusConnection, PropertiesDispatcher]
+
+
+def properties_dispatcher(bus: dbus.bus.BusConnection) -> PropertiesDispatcher:
+    ''' Returns the shared `PropertiesDispatcher` for the `bus` '''
+    try:
+        return _DISPATCHERS[bus]
+    except KeyError:
+        dispatcher = _DISPATCHERS[bus] = PropertiesDispatcher(bus)
+        return dispatcher
+
+
+class DBusMethod(object):
+    ''' Descriptor resolving a D-Bus method of a `Model` on first access.
+
+        The resolved method is stored in the instance dictionary, so later
+        lookups don't reach the descriptor at all.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, name: str) -> None:
+        super(DBusMethod, self).__init__()
+        self.name = name
+
+    def __get__(self, instance: 'Model', owner: type) -> Callable:
+        if instance is None:
+            return self
+        if self.name not in instance.interfaces.methods:
+            # installed for another instance of the class
+            raise AttributeError("'%s' object has no attribute '%s'" % (
+                owner.__name__, self.name))
+        # pylint: disable=protected-access
+        method = instance._dbus_method(self.name)
+        instance.__dict__[self.name] = method
+        return method
+
+
 class Model(qui.models.base.Model):
-    ''' Wrapper around the `dbus.proxies.ProxyObject`.  '''
+    ''' Wrapper around the `dbus.proxies.ProxyObject`.
+
+        A model can be created either from an existing `proxy` or from the
+        `bus`, `bus_name` and `object_path` of the object. In the latter case
+        the proxy is only created on the first method call.
+
+        If the `signature` (the names of the implemented interfaces) is known,
+        the interfaces are looked up in the `INTROSPECTION_CACHE` instead of
+        introspecting the object.
+    '''
 
     # pylint: disable=too-few-public-methods
 
-    def __init__(self, proxy: dbus.proxies.ProxyObject) -> None:  # pylint: disable=no-member
-        self.proxy = proxy
-        super(Model, self).__init__(self._init_interfaces())
+    def __init__(self,
+                 proxy: dbus.proxies.ProxyObject=None,  # pylint: disable=no-member
+                 signature: Iterable[str]=None,
+                 bus: dbus.bus.BusConnection=None,
+                 bus_name: str=None,
+                 object_path: dbus.ObjectPath=None) -> None:  # pylint: disable=no-member
+        self._proxy = proxy
+        if proxy is not None:
+            bus_name = proxy.bus_name
+            object_path = proxy.object_path
+        if bus is None:
+            bus = dbus.SessionBus()  # pylint: disable=no-member
+        self.bus = bus
+        self.bus_name = bus_name
+        self.object_path = object_path
+
+        if signature is None:
+            interfaces = introspect(bus, bus_name, object_path)
+        else:
+            interfaces = INTROSPECTION_CACHE.get(bus, bus_name, object_path,
+                                                 signature)
+        super(Model, self).__init__(interfaces)
+
+    @property
+    def proxy(self) -> dbus.proxies.ProxyObject:  # pylint: disable=no-member
+        ''' The `dbus.proxies.ProxyObject`, created on first use '''
+        if self._proxy is None:
+            # The interfaces are already known, no need to let the proxy
+            # introspect the object again.
+            self._proxy = self.bus.get_object(
+                bus_name=self.bus_name, object_path=self.object_path,
+                introspect=False, follow_name_owner_changes=True)
+        return self._proxy
 
     def _setup_methods(self):
-        for iface_name, iface in self.interfaces.items():
-            for method in iface.methods.keys():
-                func = self._wrap_dbus_method(iface_name, method)
-                partial_function = functools.partial(func, self.proxy)
-                setattr(self, method, partial_function)
-
-    def _init_interfaces(self) -> Dict[str, Interface]:
-        ''' Initialize the `Interface` objects '''
-        xml_str = str(self.proxy.Introspect())
-        doc = xml.dom.minidom.parseString(xml_str)
-
-        root = doc.childNodes[1]  # skip doctype
-        assert root.nodeName == 'node'
-
-        return {
-            _name(iface): Interface(iface)
-            for iface in root.getElementsByTagName('interface')
-        }
-
-    def _wrap_dbus_method(self, iface_name: str, func_name: str) -> Callable:
-        ''' Wrapper around a lambda calling
-            `dbus.proxies.ProxyObject.get_dbus_method()` with the right
-            interface and executing it.
+        ''' Make sure the class has a `DBusMethod` descriptor for every method
+            of the interfaces. The descriptors are shared by all instances of
+            the class, methods are only resolved when they are accessed.
+        '''
+        cls = type(self)
+        methods = self.interfaces.methods
+        installed = cls.__dict__.get('_dbus_methods', frozenset())
+        if installed.issuperset(methods):
+            return
+        for name in methods.keys() - installed:
+            if not hasattr(cls, name):
+                setattr(cls, name, DBusMethod(name))
+        cls._dbus_methods = installed.union(methods)
+
+    def call_async(self, name: str, *args, reply_handler: Callable=None,
+                   error_handler: Callable=None) -> None:
+        ''' Call the D-Bus method `name` without blocking the main loop.
+
+            `reply_handler` is called with the return values and
+            `error_handler` with the `dbus.DBusException`. Errors are logged if
+            no `error_handler` is passed.
+        '''
+        if reply_handler is None:
+            reply_handler = _ignore_reply
+        if error_handler is None:
+            error_handler = functools.partial(_log_error, self, name)
+        self._dbus_method(name)(*args, reply_handler=reply_handler,
+                                error_handler=error_handler)
+
+    def _dbus_method(self, name: str) -> Callable:
+        ''' Returns the `dbus.proxies` method `name` bound to the right
+            interface.
         '''
-        return lambda obj, *args, **kwargs: \
-            self.proxy.get_dbus_method(func_name, dbus_interface=iface_name)(*args, **kwargs)
+        return self.proxy.get_dbus_method(
+            name, dbus_interface=self.interfaces.methods[name])
 
 
 class Method(qui.models.base.Method):
@@ -114,36 +417,222 @@ class Signal(qui.models.base.Signal):
         super(Signal, self).__init__(name=_name(signal), **kwargs)
 
 
+class Snapshot(object):
+    ''' Compact copy of the properties of an object, converted once to native
+        Python types.
+
+        Subclasses created with `snapshot_type` keep their known properties in
+        `__slots__`, any other property is stored in a dictionary.
+    '''
+
+    __slots__ = ('_extra',)
+    fields = ()  # type: Tuple[str, ...]
+    _field_set = frozenset()  # type: FrozenSet[str]
+    empty_is_none = False
+
+    def __init__(self, data: Dict[_DictKey, Any]=None) -> None:
+        self._extra = None  # type: Dict[str, Any]
+        if data:
+            self.update(data)
+
+    def update(self, data: Dict[_DictKey, Any]) -> None:
+        ''' Update the snapshot in place '''
+        for key, value in data.items():
+            self[key] = value
+
+    def __getitem__(self, key: _DictKey) -> Any:
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: _DictKey, value: Any) -> None:
+        key = str(key)
+        value = native(value)
+        if self.empty_is_none and value == '':
+            value = None
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return hasattr(self, key)  # type: ignore
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self.fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def snapshot_type(name: str, fields: Iterable[str],
+                  empty_is_none: bool=False) -> type:
+    ''' Create a `Snapshot` subclass storing `fields` in `__slots__`. If
+        `empty_is_none` is set, empty strings are stored as `None`.
+    '''
+    fields = tuple(fields)
+    return type(name, (Snapshot, ), {
+        '__slots__': fields,
+        'fields': fields,
+        '_field_set': frozenset(fields),
+        'empty_is_none': empty_is_none,
+    })
+
+
+def native(value: Any) -> Any:
+    ''' Convert a value from `dbus-python` to the native Python type '''
+    # pylint: disable=too-many-return-statements
+    if isinstance(value, dbus.Boolean):  # pylint: disable=no-member
+        return bool(value)
+    elif isinstance(value, str):
+        return str(value)
+    elif isinstance(value, int):
+        return int(value)
+    elif isinstance(value, float):
+        return float(value)
+    elif isinstance(value, dict):
+        return {native(k): native(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [native(v) for v in value]
+    elif isinstance(value, tuple):
+        return tuple(native(v) for v in value)
+    return value
+
+
 class Properties(Model, collections.MutableMapping):
     ''' Provides dictionary access to a `org.freedesktop.DBus.Properties` object
+
+        The properties are kept in an instance of `snapshot_cls`. Properties
+        invalidated by `PropertiesChanged` are fetched again, all of them with
+        a single `GetAll` call: from the `REFRESH_QUEUE` once the main loop is
+        idle, or on the next access if that comes first. Either way the new
+        values are then passed to the `connect_properties_changed()`
+        callbacks as changed properties, from the `REFRESH_QUEUE`.
     ''' # pylint: disable=too-few-public-methods,too-many-ancestors
 
+    snapshot_cls = Snapshot
+
     def __init__(self,
-                 proxy: dbus.proxies.ProxyObject,  # pylint: disable=no-member
+                 proxy: dbus.proxies.ProxyObject=None,  # pylint: disable=no-member
                  data: dbus.Dictionary=None,  # pylint: disable=no-member
                  *args, **kwargs) -> None:
         super(Properties, self).__init__(proxy, *args, **kwargs)
         assert PROPERTIES_INTERFACE in self.interfaces
         if data is None:
             # pylint: disable=no-member
-            self._data = self.GetAll('')  # type: ignore
+            data = self.GetAll('')  # type: ignore
+        self._data = self.snapshot_cls(data)
+        self._invalidated = None  # type: Set[str]
+        # invalidated properties whose new value wasn't passed to the
+        # subscribers yet
+        self._unnotified = None  # type: Set[str]
+        # incremented on every invalidation, to detect stale `GetAll` replies
+        self._invalidations = 0
+
+        self._subscription = self.connect_properties_changed(self._update)
+
+    def connect_properties_changed(self, callback: Callable) -> Subscription:
+        ''' Call `callback(interface, changed, invalidated)` when properties of
+            this object change.
+        '''
+        dispatcher = properties_dispatcher(self.bus)
+        return dispatcher.subscribe(self.bus_name, self.object_path, callback)
+
+    def close(self) -> None:
+        ''' Stop tracking property changes, called when the object is gone '''
+        self._subscription.remove()
+        REFRESH_QUEUE.discard(self)
+
+    def refresh(self) -> None:
+        ''' Fetch all properties again '''
+        self._data.update(self.GetAll(''))  # type: ignore # pylint: disable=no-member
+        self._invalidated = None
+        # still queued, to notify the subscribers
+
+    def refresh_async(self, **kwargs) -> None:
+        ''' Non blocking variant of `refresh()`, takes the same keyword
+            arguments as `Model.call_async`. A `reply_handler` is called
+            without arguments once the properties are updated.
+        '''
+        reply_handler = kwargs.pop('reply_handler', None)
+        invalidations = self._invalidations
+
+        def _refreshed(data):
+            self._data.update(data)
+            if invalidations == self._invalidations:
+                self._invalidated = None
+                self._notify_refreshed()
+            # otherwise invalidated again meanwhile and queued for a refresh
+            if reply_handler is not None:
+                reply_handler()
+
+        self.call_async('GetAll', '', reply_handler=_refreshed, **kwargs)
+
+    def _refresh_invalidated(self) -> None:
+        ''' Called from the `REFRESH_QUEUE` '''
+        if self._invalidated:
+            self.refresh_async()
         else:
-            self._data = data
-
-        def _update(interface, changed_properties, invalidated):
-            ''' Update the internal dictionary when a property changes '''
-            # pylint: disable=unused-argument
-            for key, value in changed_properties.items():
-                self._data[key] = value
+            # fetched by `refresh()` in the meantime
+            self._notify_refreshed()
 
-        proxy.connect_to_signal(PROPERTIES_CHANGED, _update,
-                                dbus_interface=PROPERTIES_INTERFACE)
+    def _notify_refreshed(self) -> None:
+        ''' Pass the new values of the invalidated properties to the
+            subscribers, like a `PropertiesChanged` signal would.
+        '''
+        if not self._unnotified:
+            return
+        keys, self._unnotified = self._unnotified, None
+        changed = {key: self._data[key] for key in keys if key in self._data}
+        if changed:
+            properties_dispatcher(self.bus).dispatch(
+                self.bus_name, self.object_path, '', changed, [])
+
+    def _update(self, interface, changed_properties, invalidated):
+        ''' Update the internal dictionary when a property changes '''
+        # pylint: disable=unused-argument
+        for key, value in changed_properties.items():
+            self._data[key] = value
+        if self._invalidated:
+            self._invalidated.difference_update(changed_properties)
+        if self._unnotified:
+            self._unnotified.difference_update(changed_properties)
+        if invalidated:
+            if self._invalidated is None:
+                self._invalidated = set()
+            if self._unnotified is None:
+                self._unnotified = set()
+            self._invalidated.update(str(key) for key in invalidated)
+            self._unnotified.update(str(key) for key in invalidated)
+            self._invalidations += 1
+            REFRESH_QUEUE.add(self)
 
     def __getitem__(self, key: _DictKey):
+        if self._invalidated and key in self._invalidated:
+            self.refresh()
         return self._data[key]
 
     def __setitem__(self, key: _DictKey, value: Any) -> None:
-        self.proxy.Set('', key, value)  # type: ignore
+        self.Set('', key, value)  # type: ignore # pylint: disable=no-member
+
+    def set_async(self, key: _DictKey, value: Any, **kwargs) -> None:
+        ''' Non blocking variant of `self[key] = value`, takes the same keyword
+            arguments as `Model.call_async`.
+        '''
+        self.call_async('Set', '', key, value, **kwargs)
 
     def __delitem__(self, key: _DictKey):
         msg = 'It is not possible to delete D-Bus properties'
@@ -156,32 +645,223 @@ class Properties(Model, collections.MutableMapping):
         return iter(self._data)
 
 
+class Index(object):
+    ''' Object paths of the children of an `ObjectManager` by the value of
+        the property `key`.
+
+        A unique index maps every value to one object path, otherwise to a set
+        of object paths.
+
+        The values of paths passed to `invalidate()` are looked up again with
+        `lookup(object_path)` when the index is read the next time.
+    '''
+
+    def __init__(self, key: str, unique: bool=False,
+                 lookup: Callable[[str], Any]=None) -> None:
+        super(Index, self).__init__()
+        self.key = key
+        self.unique = unique
+        self.lookup = lookup
+        self._paths = {}  # type: Dict[Any, Any]
+        self._values = {}  # type: Dict[str, Any]
+        self._dirty = set()  # type: Set[str]
+
+    def invalidate(self, object_path: str) -> None:
+        ''' Look the value of `object_path` up again on the next read '''
+        self._dirty.add(object_path)
+
+    def _resolve(self) -> None:
+        ''' Update the values of the invalidated object paths '''
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        for object_path in dirty:
+            self.update(object_path, self.lookup(object_path))
+
+    def update(self, object_path: str, value: Any) -> None:
+        ''' Set the indexed value of `object_path` '''
+        self._dirty.discard(object_path)
+        if object_path in self._values:
+            if self._values[object_path] == value:
+                return
+            self.discard(object_path)
+        self._values[object_path] = value
+        if self.unique:
+            self._paths[value] = object_path
+        else:
+            self._paths.setdefault(value, set()).add(object_path)
+
+    def discard(self, object_path: str) -> None:
+        ''' Remove `object_path` from the index '''
+        self._dirty.discard(object_path)
+        try:
+            value = self._values.pop(object_path)
+        except KeyError:
+            return
+        if self.unique:
+            if self._paths.get(value) == object_path:
+                del self._paths[value]
+        else:
+            paths = self._paths[value]
+            paths.discard(object_path)
+            if not paths:
+                del self._paths[value]
+
+    def get(self, value: Any, default: Any=None) -> Any:
+        ''' Returns the object path (unique index) or the set of object paths
+            with the property set to `value`. For missing values `default` is
+            returned for unique indexes and an empty set otherwise.
+        '''
+        self._resolve()
+        try:
+            return self._paths[value]
+        except KeyError:
+            if self.unique:
+                return default
+            return frozenset()
+
+    def __getitem__(self, value: Any) -> Any:
+        self._resolve()
+        return self._paths[value]
+
+    def __contains__(self, value: object) -> bool:
+        self._resolve()
+        return value in self._paths
+
+    def __iter__(self):
+        self._resolve()
+        return iter(self._paths)
+
+    def __len__(self):
+        self._resolve()
+        return len(self._paths)
+
+
 class ObjectManager(Model):
-    ''' A Model which has child models. '''
+    ''' A Model which has child models.
+
+        `indexes` contains an `Index` for every property passed to
+        `add_index`, kept up to date as children and their properties change.
+    '''
 
     # pylint: disable=too-few-public-methods
     def __init__(self,
                  proxy: dbus.proxies.ProxyObject,  # pylint: disable=no-member
-                 cls:type=Properties) -> None:
-        super(ObjectManager, self).__init__(proxy)
+                 cls:type=Properties,
+                 bus: dbus.bus.BusConnection=None) -> None:
+        super(ObjectManager, self).__init__(proxy, bus=bus)
         assert OBJECT_MANAGER_INTERFACE in self.interfaces
+        self.child_cls = cls
+        #: the interface names of the last child built by `_managed_child`,
+        #: all children of a manager usually implement the same interfaces
+        self.child_signature = None  # type: Tuple[str, ...]
+        self.indexes = {}  # type: Dict[str, Index]
+        self._child_subscriptions = {}  # type: Dict[str, Subscription]
         child_data = self.GetManagedObjects()
         self.children = {}  # type: Dict[dbus.ObjectPath, Properties]
-        bus = dbus.SessionBus()  # pylint: disable=no-member
-        for child_path, _kwargs in child_data.items():
-            _data = list(_kwargs.values())[0]
-            child_proxy = bus.get_object(bus_name=proxy.bus_name,
-                                         object_path=child_path,
-                                         follow_name_owner_changes=True)
-            self.children[child_proxy.object_path] = cls(child_proxy, _data)
+        for child_path, interfaces in child_data.items():
+            self._add_child(child_path,
+                            self._managed_child(child_path, interfaces))
+
+    def add_index(self, key: str, unique: bool=False) -> Index:
+        ''' Create and return an `Index` of the children by property `key` '''
+        index = self.indexes[key] = Index(
+            key, unique, lookup=lambda path: self.children[path].get(key))
+        for path, child in self.children.items():
+            index.update(path, child.get(key))
+        return index
+
+    def _new_child(self, object_path: dbus.ObjectPath,  # pylint: disable=no-member
+                   data: dbus.Dictionary=None,  # pylint: disable=no-member
+                   signature: Iterable[str]=None) -> Properties:
+        ''' Create the child model for `object_path` '''
+        return self.child_cls(data=data, signature=signature, bus=self.bus,
+                              bus_name=self.bus_name, object_path=object_path)
+
+    def _managed_child(self, object_path: dbus.ObjectPath,  # pylint: disable=no-member
+                       interfaces: Dict[str, dbus.Dictionary]  # pylint: disable=no-member
+                      ) -> Properties:
+        ''' Create the child model from its entry in the reply of
+            `GetManagedObjects`.
+        '''
+        # The reply already contains all the properties of the child, so
+        # neither a proxy nor a `GetAll` call is needed to build it.
+        data = dbus.Dictionary()  # pylint: disable=no-member
+        for properties in interfaces.values():
+            data.update(properties)
+        self.child_signature = tuple(str(name) for name in interfaces.keys())
+        return self._new_child(object_path, data,
+                               signature=self.child_signature)
+
+    def _add_child(self, object_path: dbus.ObjectPath,  # pylint: disable=no-member
+                   child: Properties) -> None:
+        ''' Add `child` to `children` and the indexes '''
+        self.children[object_path] = child
+        for key, index in self.indexes.items():
+            index.update(object_path, child.get(key))
+        self._child_subscriptions[object_path] = \
+            child.connect_properties_changed(
+                functools.partial(self._child_changed, object_path))
+
+    def _remove_child(self, object_path: dbus.ObjectPath  # pylint: disable=no-member
+                     ) -> Properties:
+        ''' Remove the child from `children` and the indexes '''
+        child = self.children.pop(object_path)
+        for index in self.indexes.values():
+            index.discard(object_path)
+        self._child_subscriptions.pop(object_path).remove()
+        child.close()
+        return child
+
+    def _child_changed(self, object_path, interface, changed_properties,
+                       invalidated):
+        ''' Update the indexes when properties of a child change. Invalidated
+            properties are only looked up when the index is read.
+        '''
+        # pylint: disable=unused-argument
+        if not self.indexes:
+            return
+        child = self.children[object_path]
+        for key in changed_properties:
+            if key in self.indexes:
+                self.indexes[key].update(object_path, child.get(key))
+        for key in invalidated:
+            if key in self.indexes and key not in changed_properties:
+                self.indexes[key].invalidate(object_path)
 
     def GetManagedObjects(self):
         ''' Wrapper around
             'org.freedesktop.DBus.ObjectManager.GetManagedObjects'. This wrapper
             is used to keep mypy and pylint happy.
-        '''  # pylint: disable=useless-super-delegation
-        # type:ignore pylint: disable=no-member,invalid-name
-        return super(ObjectManager, self).GetManagedObjects()
+        '''  # pylint: disable=invalid-name
+        return self._dbus_method('GetManagedObjects')()
+
+
+def _ignore_reply(*args) -> None:
+    ''' Reply handler for calls whose return value is not needed '''
+    # pylint: disable=unused-argument
+    pass
+
+
+def _log_error(model: Model, name: str, error: Exception) -> None:
+    ''' Default error handler for `Model.call_async` '''
+    _LOG.error('%s.%s() failed: %s', model.object_path, name, error)
+
+
+def introspect(bus: dbus.bus.BusConnection, bus_name: str,
+               object_path: str) -> Interfaces:
+    ''' Introspect the object and return its `Interface` objects. '''
+    xml_str = str(bus.call_blocking(bus_name, object_path,
+                                    INTROSPECTABLE_INTERFACE, 'Introspect',
+                                    '', ()))
+    doc = xml.dom.minidom.parseString(xml_str)
+
+    root = doc.childNodes[1]  # skip doctype
+    assert root.nodeName == 'node'
+
+    return Interfaces([
+        Interface(iface) for iface in root.getElementsByTagName('interface')
+    ])
 
 
 def _name(elem: xml.dom.minidom.Element) -> str:
@@ -19,42 +19,52 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 ''' Data Models '''
-from typing import Any  # pylint: disable=unused-import
+import collections
+import logging
+from typing import (Any, Callable, Dict, Iterable,  # pylint: disable=unused-import
+                    List, Set, Tuple)
 
 import dbus
+import dbus.bus
 
-from qui.models.dbus import ObjectManager, Properties, _DictKey
+from qui.models.dbus import (ObjectManager, Properties, _DictKey,
+                             snapshot_type)
+
+from gi.repository import GLib  # isort:skip
 
 
 # pylint: disable=too-few-public-methods,too-many-ancestors
 
+# Signals of `org.qubes.DomainManager1` named after the new domain state
+DOMAIN_STATES = ('Starting', 'Started', 'Failed', 'Halting', 'Halted',
+                 'Unknown')
+
+# Device `Added`/`Removed` signals received within this time are applied
+# together
+HOTPLUG_DELAY = 100  # ms
+
+_LOG = logging.getLogger(__name__)
+
+
 class Label(Properties):
     ''' Wrapper around `org.qubes.Label` Interface '''
 
+    snapshot_cls = snapshot_type('LabelSnapshot',
+                                 ('name', 'icon', 'color', 'index'))
+
     def _setup_signals(self):
         pass
 
 
-class _Singleton(type):
-    ''' A singleton metaclass '''
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(_Singleton, cls).__call__(*args,
-                                                                  **kwargs)
-        return cls._instances[cls]
-
-
 class LabelsManager(ObjectManager):
     ''' Wraper around `org.qubes.Labels1` '''
-    __metaclass__ = _Singleton
 
-    def __init__(self):
-        bus = dbus.SessionBus()  # pylint: disable=no-member
-        proxy = bus.get_object('org.qubes.Labels1', '/org/qubes/Labels1',
-                               follow_name_owner_changes=True)
-        super().__init__(proxy, cls=Label)
+    def __init__(self, registry: 'Registry'):
+        self.registry = registry
+        proxy = registry.bus.get_object('org.qubes.Labels1',
+                                        '/org/qubes/Labels1',
+                                        follow_name_owner_changes=True)
+        super().__init__(proxy, cls=Label, bus=registry.bus)
         for key, value in self.children.items():
             name = key.split('/')[-1].upper()
             setattr(self, name, value)
@@ -70,24 +80,37 @@ class LabelsManager(ObjectManager):
 class Device(Properties):
     ''' Wrapper around `org.qubes.Device` Interface '''
 
+    snapshot_cls = snapshot_type('DeviceSnapshot',
+                                 ('ident', 'dev_class', 'description',
+                                  'backend_domain', 'frontend_domain'),
+                                 empty_is_none=True)
+
+    def __init__(self, registry: 'Registry',
+                 proxy: dbus.proxies.ProxyObject=None,  # pylint: disable=no-member
+                 data: dbus.Dictionary=None,  # pylint: disable=no-member
+                 **kwargs) -> None:
+        self.registry = registry
+        super().__init__(proxy, data, **kwargs)
+
     def connect_to_signal(self, signal_name, handler_function):
-        ''' Handy wrapper around self.proxy.connect_to_signal'''
-        return self.proxy.connect_to_signal(
-                signal_name, handler_function,
-                dbus_interface='org.qubes.Device')
+        ''' Handy wrapper around self.bus.add_signal_receiver '''
+        return self.bus.add_signal_receiver(
+                handler_function, signal_name=signal_name,
+                dbus_interface='org.qubes.Device', bus_name=self.bus_name,
+                path=self.object_path)
 
     @property
     def frontend_domain(self):
         try:
             vm_obj_path = self['frontend_domain']
-            return DomainManager().children[vm_obj_path]
         except KeyError:
             return None
+        return self.registry.domains.children.get(vm_obj_path)
 
     @property
     def backend_domain(self):
         vm_obj_path = self['backend_domain']
-        return DomainManager().children[vm_obj_path]
+        return self.registry.domains.children[vm_obj_path]
 
     @property
     def name(self):
@@ -96,36 +119,131 @@ class Device(Properties):
             name += " - " + self["description"]
         return name
 
-    def __getitem__(self, key: _DictKey):
-        value = super().__getitem__(key)
-        if value == '':
-            return None
-        return value
-
     def _setup_signals(self):
         pass
 
 
 class DevicesManager(ObjectManager):
-    ''' Wraper around `org.qubes.Devices1` '''
-    __metaclass__ = _Singleton
-
-    def __init__(self):
-        self.bus = dbus.SessionBus()  # pylint: disable=no-member
-        proxy = self.bus.get_object('org.qubes.Devices1', '/org/qubes/Devices1',
-                               follow_name_owner_changes=True)
-        super().__init__(proxy, cls=Device)
+    ''' Wraper around `org.qubes.Devices1`
+
+        The `Added` and `Removed` signals are collected for `hotplug_delay`
+        milliseconds and applied as one batch, e.g. when a USB hub is plugged
+        in. A device added and removed again within that time is ignored.
+        Handlers registered with `connect_batch()` are called once per batch,
+        after `children` is updated.
+    '''
+
+    def __init__(self, registry: 'Registry',
+                 hotplug_delay: int=HOTPLUG_DELAY):
+        self.registry = registry
+        proxy = registry.bus.get_object('org.qubes.Devices1',
+                                        '/org/qubes/Devices1',
+                                        follow_name_owner_changes=True)
+        super().__init__(proxy, cls=Device, bus=registry.bus)
+        self.by_backend = self.add_index('backend_domain')
+        self.by_frontend = self.add_index('frontend_domain')
+        self.by_class = self.add_index('dev_class')
+        self.hotplug_delay = hotplug_delay
+        # object path -> whether the device is present after the batch
+        self._hotplug = collections.OrderedDict(
+        )  # type: Dict[dbus.ObjectPath, bool]
+        # devices removed and added again, their model has to be replaced
+        self._replaced = set()  # type: Set[dbus.ObjectPath]
+        self._hotplug_source = None  # type: int
+        self._batch_handlers = []  # type: List[Callable]
         self.connect_to_signal("Added", self._add)
         self.connect_to_signal("Removed", self._remove)
         self._setup_signals()
 
+    def _new_child(self, object_path, data=None, signature=None):
+        return Device(self.registry, data=data, signature=signature,
+                      bus=self.bus, bus_name=self.bus_name,
+                      object_path=object_path)
+
+    def connect_batch(self, handler: Callable) -> Callable:
+        ''' Call `handler(added, removed)` with the lists of object paths of
+            every applied batch. Replaced devices are in both lists.
+        '''
+        self._batch_handlers.append(handler)
+        return handler
+
+    def disconnect_batch(self, handler: Callable) -> None:
+        ''' Remove a handler added by `connect_batch()` '''
+        self._batch_handlers.remove(handler)
+
     def _add(self, obj_path: dbus.ObjectPath):
-        proxy = self.bus.get_object('org.qubes.Devices1', obj_path)
-        self.children[obj_path] = Device(proxy)
+        if self._hotplug.get(obj_path) is False or obj_path in self.children:
+            self._replaced.add(obj_path)
+        self._queue(obj_path, True)
 
     def _remove(self, obj_path: dbus.ObjectPath):
-        proxy = self.bus.get_object('org.qubes.Devices1', obj_path)
-        del self.children[obj_path]
+        self._replaced.discard(obj_path)
+        self._queue(obj_path, False)
+
+    def _queue(self, obj_path: dbus.ObjectPath, present: bool) -> None:
+        self._hotplug[obj_path] = present
+        if self._hotplug_source is None:
+            self._hotplug_source = GLib.timeout_add(self.hotplug_delay,
+                                                    self._flush_hotplug)
+
+    def flush_hotplug(self) -> None:
+        ''' Apply the queued `Added` and `Removed` signals now '''
+        if self._hotplug_source is not None:
+            GLib.source_remove(self._hotplug_source)
+            self._flush_hotplug()
+
+    def _flush_hotplug(self) -> bool:
+        self._hotplug_source = None
+        pending, self._hotplug = self._hotplug, collections.OrderedDict()
+        replaced, self._replaced = self._replaced, set()
+
+        removed = [path for path, present in pending.items()
+                   if path in self.children and (not present
+                                                 or path in replaced)]
+        added = [path for path, present in pending.items()
+                 if present and (path not in self.children
+                                 or path in replaced)]
+
+        applied = []  # type: List[dbus.ObjectPath]
+        try:
+            for obj_path in removed:
+                self._remove_child(obj_path)
+            for obj_path, child in self._fetch_devices(added):
+                self._add_child(obj_path, child)
+                applied.append(obj_path)
+        finally:
+            if applied or removed:
+                for handler in list(self._batch_handlers):
+                    handler(applied, removed)
+        return False  # remove the GLib source
+
+    def _fetch_devices(self, obj_paths: List[dbus.ObjectPath]
+                      ) -> Iterable[Tuple[dbus.ObjectPath, Device]]:
+        ''' Yield the models of the added devices. Devices which are gone
+            again or can't be fetched are skipped.
+        '''
+        managed = None
+        if len(obj_paths) > 1 or (obj_paths and self.child_signature is None):
+            # A single call instead of one `GetAll` per device, the reply also
+            # has the interfaces of the devices
+            try:
+                managed = self.GetManagedObjects()
+            except dbus.DBusException as error:
+                _LOG.warning('Failed to fetch the added devices: %s', error)
+
+        for obj_path in obj_paths:
+            try:
+                if managed is None:
+                    child = self._new_child(obj_path,
+                                            signature=self.child_signature)
+                elif obj_path in managed:
+                    child = self._managed_child(obj_path, managed[obj_path])
+                else:
+                    continue  # removed before the batch was applied
+            except dbus.DBusException as error:
+                _LOG.warning('Failed to fetch device %s: %s', obj_path, error)
+                continue
+            yield obj_path, child
 
     def __getitem__(self, key: dbus.ObjectPath) -> Label:
         return self.children[key]
@@ -147,15 +265,15 @@ class DevicesManager(ObjectManager):
 class Domain(Properties):
     ''' Wrapper around `org.qubes.Domain` Interface '''
 
-    def __init__(self, proxy: dbus.proxies.ProxyObject,  # pylint: disable=no-member
-                 data: dbus.Dictionary=None) -> None:  # pylint: disable=no-member
-        super().__init__(proxy)
+    snapshot_cls = snapshot_type('DomainSnapshot',
+                                 ('name', 'state', 'label', 'memory_usage',
+                                  'netvm', 'klass', 'qid'),
+                                 empty_is_none=True)
 
-    def __getitem__(self, key: _DictKey):
-        value = super().__getitem__(key)
-        if value == '':
-            return None
-        return value
+    def __init__(self, proxy: dbus.proxies.ProxyObject=None,  # pylint: disable=no-member
+                 data: dbus.Dictionary=None,  # pylint: disable=no-member
+                 **kwargs) -> None:
+        super().__init__(proxy, data, **kwargs)
 
     def __setitem__(self, key: _DictKey, value: Any) -> None:
         pass
@@ -166,16 +284,40 @@ class Domain(Properties):
 
 class DomainManager(Properties,ObjectManager):
     ''' Wraper around `org.qubes.DomainManager1` '''
-    _metaclass__ = _Singleton
-
-    def __init__(self):
-        self.bus = dbus.SessionBus()  # pylint: disable=no-member
-        proxy = self.bus.get_object('org.qubes.DomainManager1',
-                                    '/org/qubes/DomainManager1',
-                                    follow_name_owner_changes=True)
-        super().__init__(proxy, cls=Domain)
+
+    def __init__(self, registry: 'Registry'):
+        self.registry = registry
+        proxy = registry.bus.get_object('org.qubes.DomainManager1',
+                                        '/org/qubes/DomainManager1',
+                                        follow_name_owner_changes=True)
+        super().__init__(proxy, cls=Domain, bus=registry.bus)
+        self.by_name = self.add_index('name', unique=True)
+        self.by_state = self.add_index('state')
+        self._signal_match = self.bus.add_signal_receiver(
+            self._domain_signal, dbus_interface='org.qubes.DomainManager1',
+            bus_name=self.bus_name, path=self.object_path,
+            member_keyword='member')
         self._setup_signals()
 
+    def _domain_signal(self, _, obj_path: dbus.ObjectPath, member=None):
+        ''' Keep `children` and the indexes up to date, before any other
+            handler of the same signal is called.
+        '''
+        if member == 'DomainAdded':
+            if obj_path not in self.children:
+                # looked up in the introspection cache, if any domain was
+                # seen before
+                self._add_child(obj_path, self._new_child(
+                    obj_path, signature=self.child_signature))
+        elif member == 'DomainRemoved':
+            if obj_path in self.children:
+                self._remove_child(obj_path)
+        elif member in DOMAIN_STATES and obj_path in self.children:
+            changed = {'state': member}
+            # pylint: disable=protected-access
+            self.children[obj_path]._update('', changed, [])
+            self._child_changed(obj_path, '', changed, [])
+
     def connect_to_signal(self, signal_name, handler_function):
         ''' Handy wrapper around self.proxy.connect_to_signal'''
         return self.proxy.connect_to_signal(
@@ -189,3 +331,72 @@ class DomainManager(Properties,ObjectManager):
     def _setup_signals(self):
         pass
 
+
+class Registry(object):
+    ''' Owns the `DomainManager`, `DevicesManager` and `LabelsManager` of a
+        bus connection. The managers are created on first access.
+
+        The models don't depend on `qubesadmin`, see `qui.admin.CachedQubes`
+        for mapping them to `qubesadmin` objects.
+    '''
+
+    def __init__(self, bus: dbus.bus.BusConnection=None) -> None:
+        super(Registry, self).__init__()
+        if bus is None:
+            bus = dbus.SessionBus()  # pylint: disable=no-member
+        self.bus = bus
+        self._domains = None  # type: DomainManager
+        self._devices = None  # type: DevicesManager
+        self._labels = None  # type: LabelsManager
+
+    @property
+    def domains(self) -> DomainManager:
+        ''' The shared `DomainManager` '''
+        if self._domains is None:
+            self._domains = DomainManager(self)
+        return self._domains
+
+    @property
+    def devices(self) -> DevicesManager:
+        ''' The shared `DevicesManager` '''
+        if self._devices is None:
+            self._devices = DevicesManager(self)
+        return self._devices
+
+    @property
+    def labels(self) -> LabelsManager:
+        ''' The shared `LabelsManager` '''
+        if self._labels is None:
+            self._labels = LabelsManager(self)
+        return self._labels
+
+    def sync(self, managers: Iterable[str]=('domains', 'devices', 'labels')
+            ) -> None:
+        ''' Create the named managers now instead of on first access, this
+            fetches the state of all their objects from the bus.
+        '''
+        for name in managers:
+            getattr(self, name)
+
+
+_REGISTRIES = {}  # type: Dict[dbus.bus.BusConnection, Registry]
+
+
+def registry(bus: dbus.bus.BusConnection=None) -> Registry:
+    ''' Returns the process wide `Registry` for `bus`, by default the session
+        bus.
+    '''
+    if bus is None:
+        bus = dbus.SessionBus()  # pylint: disable=no-member
+    try:
+        return _REGISTRIES[bus]
+    except KeyError:
+        result = _REGISTRIES[bus] = Registry(bus)
+        return result
+
+
+def set_registry(new_registry: Registry) -> None:
+    ''' Make `new_registry` the one returned by `registry()` for its bus,
+        e.g. to inject fake managers in tests.
+    '''
+    _REGISTRIES[new_registry.bus] = new_registry
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+''' Desktop notifications through `org.freedesktop.Notifications`.
+
+Notifications are sent asynchronously from the GLib main loop instead of
+forking `notify-send`. They are queued for a short time, so bursts can be
+merged into a single summary notification.
+'''
+
+import collections
+import logging
+
+import dbus
+import dbus.bus
+
+from typing import Any, Dict, List  # pylint: disable=unused-import
+
+from gi.repository import GLib  # isort:skip
+
+NOTIFICATIONS_BUS_NAME = 'org.freedesktop.Notifications'
+NOTIFICATIONS_PATH = '/org/freedesktop/Notifications'
+NOTIFICATIONS_INTERFACE = 'org.freedesktop.Notifications'
+
+DEFAULT_DELAY = 500  # ms
+
+_LOG = logging.getLogger(__name__)
+
+
+class _Pending():
+    ''' Notifications of one group waiting to be sent '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, key: Any, group_summary: str) -> None:
+        self.key = key
+        self.group_summary = group_summary
+        self.messages = []  # type: List[str]
+
+
+class Notifier():
+    ''' Sends desktop notifications without blocking the main loop.
+
+        Notifications are sent at most every `delay` milliseconds. If more than
+        one notification of the same `group` is queued in that time, a single
+        notification with the `group_summary` is sent instead, e.g.
+        "5 devices available". A notification with a `key` replaces the last
+        notification sent with the same key, e.g. "Domain work is started"
+        replaces "Domain work is starting".
+
+        `sent` counts the notifications sent, `merged` the ones merged into
+        another notification.
+    '''
+
+    def __init__(self, app_name: str, bus: dbus.bus.BusConnection=None,
+                 delay: int=DEFAULT_DELAY) -> None:
+        super(Notifier, self).__init__()
+        if bus is None:
+            bus = dbus.SessionBus()  # pylint: disable=no-member
+        self.bus = bus
+        self.app_name = app_name
+        self.delay = delay
+        self._pending = collections.OrderedDict()  # type: Dict[Any, _Pending]
+        self._ids = {}  # type: Dict[Any, int]
+        self._source = None  # type: int
+        self.sent = 0
+        self.merged = 0
+
+    def notify(self, message: str, key: Any=None, group: str=None,
+               group_summary: str=None) -> None:
+        ''' Queue the notification `message`.
+
+            `group_summary` is a format string taking the number of merged
+            notifications of the `group`.
+        '''
+        if group is not None:
+            group_key = ('group', group)
+        elif key is not None:
+            group_key = ('key', key)
+        else:
+            group_key = object()
+
+        try:
+            pending = self._pending[group_key]
+        except KeyError:
+            pending = self._pending[group_key] = _Pending(key, group_summary)
+
+        if group is None and pending.messages:
+            # A newer message for the same key supersedes the queued one
+            pending.messages = []
+            self.merged += 1
+        pending.messages.append(message)
+
+        if self._source is None:
+            self._source = GLib.timeout_add(self.delay, self._flush)
+
+    def _flush(self) -> bool:
+        self._source = None
+        pending, self._pending = self._pending, collections.OrderedDict()
+        for entry in pending.values():
+            if len(entry.messages) == 1 or entry.group_summary is None:
+                message = entry.messages[-1]
+            else:
+                message = entry.group_summary % len(entry.messages)
+            self.merged += len(entry.messages) - 1
+            self._send(message, entry.key)
+        return False  # remove the GLib source
+
+    def _send(self, summary: str, key: Any) -> None:
+        replaces_id = self._ids.get(key, 0) if key is not None else 0
+
+        def _reply(notification_id):
+            if key is not None:
+                self._ids[key] = notification_id
+
+        def _error(error):
+            _LOG.warning('Failed to send notification "%s": %s', summary,
+                         error)
+
+        self.bus.call_async(NOTIFICATIONS_BUS_NAME, NOTIFICATIONS_PATH,
+                            NOTIFICATIONS_INTERFACE, 'Notify', 'susssasa{sv}i',
+                            (self.app_name, replaces_id, '', summary, '', [],
+                             {}, -1), _reply, _error)
+        self.sent += 1
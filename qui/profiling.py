@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+''' Timing of the startup phases of the tray applications.
+
+The entry point modules import this module before anything else, so the
+import time of the application is measured from `IMPORT_STARTED`.
+'''
+
+import contextlib
+import sys
+import time
+
+IMPORT_STARTED = time.monotonic()
+
+# pylint: disable=wrong-import-position
+from typing import IO, Callable, List, Tuple  # pylint: disable=unused-import
+
+from gi.repository import GLib  # isort:skip
+
+# Runs right after GTK redraws (`GDK_PRIORITY_REDRAW` is
+# `PRIORITY_HIGH_IDLE + 20`), before the default priority idle callbacks
+AFTER_REDRAW_PRIORITY = GLib.PRIORITY_HIGH_IDLE + 30
+
+
+class StartupProfile():
+    ''' Collects the durations of the startup phases. Nothing is printed by
+        `report()` unless the profile is `enabled`.
+    '''
+
+    def __init__(self, enabled: bool=False) -> None:
+        self.enabled = enabled
+        self.started = IMPORT_STARTED
+        self.phases = []  # type: List[Tuple[str, float]]
+
+    def imports_done(self) -> None:
+        ''' Record the time spent importing modules so far '''
+        self.add('import', time.monotonic() - IMPORT_STARTED)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        ''' Context manager measuring the phase `name` '''
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def first_render(self, callback: Callable=None) -> None:
+        ''' Measure the phase "first render" from now until the main loop
+            has drawn the pending widgets, then call `callback()`.
+        '''
+        start = time.monotonic()
+
+        def _rendered():
+            self.add('first render', time.monotonic() - start)
+            if callback is not None:
+                callback()
+            return False  # remove the GLib source
+
+        GLib.idle_add(_rendered, priority=AFTER_REDRAW_PRIORITY)
+
+    def add(self, name: str, duration: float) -> None:
+        ''' Record that phase `name` took `duration` seconds '''
+        self.phases.append((name, duration))
+
+    def report(self, out: IO[str]=None) -> None:
+        ''' Print the phases and the time since the imports started '''
+        if not self.enabled:
+            return
+        if out is None:
+            out = sys.stderr
+        for name, duration in self.phases:
+            print('%-24s %9.1f ms' % (name, duration * 1000), file=out)
+        total = time.monotonic() - self.started
+        print('%-24s %9.1f ms' % ('total', total * 1000), file=out)
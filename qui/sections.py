@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+''' Bookkeeping for menus made of sorted sections.
+
+The widgets are not touched here, the methods return the menu positions at
+which the caller has to insert or remove its items. Every section but the
+first is preceded by a separator.
+'''
+
+import bisect
+
+from typing import Any, Dict, Iterable, List  # pylint: disable=unused-import
+
+
+class Section():
+    ''' The sort keys of the items in a section, kept sorted '''
+
+    def __init__(self, name: Any) -> None:
+        self.name = name
+        self._keys = []  # type: List[Any]
+
+    def insert(self, key: Any) -> int:
+        ''' Add `key` and return its index in the section '''
+        index = bisect.bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        return index
+
+    def remove(self, key: Any) -> int:
+        ''' Remove `key` and return the index it had in the section '''
+        index = self.index(key)
+        del self._keys[index]
+        return index
+
+    def index(self, key: Any) -> int:
+        ''' Returns the index of `key` in the section '''
+        index = bisect.bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            raise KeyError(key)
+        return index
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class Sections():
+    ''' An ordered list of `Section` objects.
+
+        Menu positions are derived from the section sizes: the items of a
+        section come after the items and separators of all the sections
+        before it.
+    '''
+
+    def __init__(self, names: Iterable[Any]=()) -> None:
+        self._sections = []  # type: List[Section]
+        self._by_name = {}  # type: Dict[Any, Section]
+        for name in names:
+            self.add_section(name)
+
+    def add_section(self, name: Any, index: int=None) -> int:
+        ''' Add an empty section at `index` (by default the end) and return
+            the menu position of its separator. The first section has no
+            separator, adding a section in front of it returns the position of
+            the separator needed by the old first section.
+        '''
+        assert name not in self._by_name
+        if index is None:
+            index = len(self._sections)
+        section = Section(name)
+        self._sections.insert(index, section)
+        self._by_name[name] = section
+        if index == 0:
+            return 0
+        return self.offset(name) - 1
+
+    def remove_section(self, name: Any) -> int:
+        ''' Remove the empty section `name` and return the menu position of
+            the separator which is not needed anymore.
+        '''
+        section = self._by_name[name]
+        assert not section
+        position = max(self.offset(name) - 1, 0)
+        self._sections.remove(section)
+        del self._by_name[name]
+        return position
+
+    def offset(self, name: Any) -> int:
+        ''' Menu position of the first item in section `name` '''
+        position = 0
+        for index, section in enumerate(self._sections):
+            if index > 0:
+                position += 1  # the separator
+            if section.name == name:
+                return position
+            position += len(section)
+        raise KeyError(name)
+
+    def insert(self, name: Any, key: Any) -> int:
+        ''' Add `key` to section `name` and return its menu position '''
+        return self.offset(name) + self._by_name[name].insert(key)
+
+    def remove(self, name: Any, key: Any) -> int:
+        ''' Remove `key` from section `name` and return the menu position it
+            had.
+        '''
+        return self.offset(name) + self._by_name[name].remove(key)
+
+    def position(self, name: Any, key: Any) -> int:
+        ''' Returns the menu position of `key` in section `name` '''
+        return self.offset(name) + self._by_name[name].index(key)
+
+    def __getitem__(self, name: Any) -> Section:
+        return self._by_name[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+''' Ties bus subscriptions to the lifetime of the widget or object using
+them.
+
+A subscription owned by a `Gtk.Widget` is removed when the widget is
+destroyed, one owned by any other object when the object is garbage
+collected. The number of live subscriptions per signal is kept, so leaked
+handlers show up in the counts.
+'''
+
+import collections
+import weakref
+
+from typing import Any, Callable, Dict, List  # pylint: disable=unused-import
+
+import gi  # isort:skip
+gi.require_version('Gtk', '3.0')  # isort:skip
+from gi.repository import Gtk  # isort:skip
+
+
+class TrackedSubscription():
+    ''' A subscription registered in a `SubscriptionManager` '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, manager: 'SubscriptionManager', owner_id: int,
+                 signal_name: str, subscription: Any) -> None:
+        self.manager = manager
+        self.owner_id = owner_id
+        self.signal_name = signal_name
+        self.subscription = subscription
+
+    def remove(self) -> None:
+        ''' Remove the subscription from the bus, if not done already '''
+        if self.subscription is None:
+            return
+        subscription, self.subscription = self.subscription, None
+        subscription.remove()
+        self.manager._forget(self)  # pylint: disable=protected-access
+
+
+class SubscriptionManager():
+    ''' Removes subscriptions together with their owner.
+
+        Subscriptions are objects with a `remove()` method, e.g. the
+        `dbus.connection.SignalMatch` returned by `add_signal_receiver` or the
+        `qui.models.dbus.Subscription` returned by
+        `connect_properties_changed`.
+
+        The handler of a subscription owned by an object which isn't a widget
+        must not keep the owner alive, see `weak_handler()`.
+    '''
+
+    def __init__(self) -> None:
+        self._owned = {}  # type: Dict[int, List[TrackedSubscription]]
+        self._live = collections.Counter()  # type: Dict[str, int]
+
+    def add(self, owner: Any, signal_name: str,
+            subscription: Any) -> TrackedSubscription:
+        ''' Remove `subscription` of `signal_name` when `owner` goes away '''
+        owner_id = id(owner)
+        tracked = TrackedSubscription(self, owner_id, signal_name,
+                                      subscription)
+        owned = self._owned.get(owner_id)
+        if owned is None:
+            owned = self._owned[owner_id] = []
+            if isinstance(owner, Gtk.Widget):
+                owner.connect('destroy', self._destroyed, owner_id)
+            else:
+                weakref.finalize(owner, self.release_id, owner_id)
+        owned.append(tracked)
+        self._live[signal_name] += 1
+        return tracked
+
+    def release(self, owner: Any) -> None:
+        ''' Remove all subscriptions of `owner` now '''
+        self.release_id(id(owner))
+
+    def release_id(self, owner_id: int) -> None:
+        ''' Remove all subscriptions of the owner with the `id()` `owner_id` '''
+        for tracked in list(self._owned.get(owner_id, ())):
+            tracked.remove()
+
+    def live(self, signal_name: str=None) -> int:
+        ''' Number of live subscriptions of `signal_name`, or of all signals
+        '''
+        if signal_name is None:
+            return sum(self._live.values())
+        return self._live[signal_name]
+
+    def counts(self) -> Dict[str, int]:
+        ''' Returns the number of live subscriptions per signal '''
+        return {name: count for name, count in self._live.items() if count}
+
+    def _destroyed(self, _widget, owner_id: int) -> None:
+        self.release_id(owner_id)
+
+    def _forget(self, tracked: TrackedSubscription) -> None:
+        self._live[tracked.signal_name] -= 1
+        owned = self._owned[tracked.owner_id]
+        owned.remove(tracked)
+        if not owned:
+            del self._owned[tracked.owner_id]
+
+
+def weak_handler(method: Callable) -> Callable:
+    ''' Wrap the bound `method` in a handler which doesn't keep its object
+        alive. Calls after the object is gone are ignored.
+    '''
+    ref = weakref.WeakMethod(method)
+
+    def _handler(*args, **kwargs):
+        bound = ref()
+        if bound is not None:
+            return bound(*args, **kwargs)
+        return None
+
+    return _handler
+
+
+#: The process wide `SubscriptionManager`
+SUBSCRIPTIONS = SubscriptionManager()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+''' Tests of `qui.logviewer` '''
+# pylint: disable=missing-docstring
+
+import os
+import tempfile
+import unittest
+
+import qui.logviewer
+
+
+class TC_00_tail_offset(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        log_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False)
+        log_file.close()
+        self.path = log_file.name
+        self.addCleanup(os.unlink, self.path)
+
+    def tail_offset(self, data: bytes, lines: int) -> int:
+        with open(self.path, 'wb') as log_file:
+            log_file.write(data)
+        return qui.logviewer.tail_offset(self.path, lines)
+
+    def test_000_trailing_newline(self):
+        self.assertEqual(self.tail_offset(b'a\nbb\nccc\n', 1), 5)
+        self.assertEqual(self.tail_offset(b'a\nbb\nccc\n', 2), 2)
+
+    def test_001_no_trailing_newline(self):
+        self.assertEqual(self.tail_offset(b'a\nbb\nlogin:', 1), 5)
+        self.assertEqual(self.tail_offset(b'a\nbb\nlogin:', 2), 2)
+
+    def test_002_empty(self):
+        self.assertEqual(self.tail_offset(b'', 10), 0)
+
+    def test_003_more_lines_than_exist(self):
+        self.assertEqual(self.tail_offset(b'a\nbb\nccc\n', 3), 0)
+        self.assertEqual(self.tail_offset(b'a\nbb\nccc\n', 10), 0)
+        self.assertEqual(self.tail_offset(b'a\nbb\nccc', 10), 0)
+
+    def test_004_single_line(self):
+        self.assertEqual(self.tail_offset(b'abc', 1), 0)
+        self.assertEqual(self.tail_offset(b'abc\n', 1), 0)
+
+    def test_005_empty_lines(self):
+        self.assertEqual(self.tail_offset(b'a\n\n\n', 2), 2)
+
+    def test_006_missing_file(self):
+        with self.assertRaises(OSError):
+            qui.logviewer.tail_offset(self.path + '.missing', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
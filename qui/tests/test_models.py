@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+''' Tests of `qui.models.qubes` '''
+# pylint: disable=missing-docstring,protected-access
+
+import unittest
+import unittest.mock
+
+import qui.models.dbus
+import qui.models.qubes
+
+DEV = '/org/qubes/Devices1/usb/%d'
+
+
+def _fake_object_manager_init(self, proxy, cls=None, bus=None):
+    ''' `ObjectManager.__init__` without the bus calls '''
+    # pylint: disable=unused-argument
+    self._proxy = unittest.mock.Mock()
+    self.child_cls = cls
+    self.child_signature = ('org.qubes.Device',)
+    self.indexes = {}
+    self._child_subscriptions = {}
+    self.children = {}
+
+
+class FakeDevicesManager(qui.models.qubes.DevicesManager):
+    ''' Serves the devices in `present` instead of fetching them '''
+
+    def __init__(self):
+        self.present = {}  # object path -> properties
+        self.fetches = []
+        super(FakeDevicesManager, self).__init__(unittest.mock.Mock())
+
+    def GetManagedObjects(self):  # pylint: disable=invalid-name
+        self.fetches.append('GetManagedObjects')
+        return {path: {'org.qubes.Device': data}
+                for path, data in self.present.items()}
+
+    def _new_child(self, object_path, data=None, signature=None):
+        if data is None:
+            self.fetches.append(object_path)
+            data = self.present[object_path]
+        child = unittest.mock.Mock()
+        child.object_path = object_path
+        child.get.side_effect = data.get
+        return child
+
+
+class TC_00_DevicesManager(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        patches = [
+            unittest.mock.patch.object(qui.models.dbus.ObjectManager,
+                                       '__init__', _fake_object_manager_init),
+            unittest.mock.patch.object(qui.models.qubes, 'GLib'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.manager = FakeDevicesManager()
+        self.batches = []
+        self.manager.connect_batch(
+            lambda added, removed: self.batches.append((added, removed)))
+
+    def plug(self, number, backend='/vm/sys-usb'):
+        path = DEV % number
+        self.manager.present[path] = {'dev_class': 'usb',
+                                      'backend_domain': backend}
+        self.manager._add(path)
+        return path
+
+    def unplug(self, path):
+        self.manager.present.pop(path, None)
+        self.manager._remove(path)
+
+    def test_000_add(self):
+        path = self.plug(1)
+        self.assertEqual(self.batches, [])
+        self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [([path], [])])
+        self.assertIn(path, self.manager.children)
+        self.assertEqual(self.manager.by_backend.get('/vm/sys-usb'), {path})
+        # a single device is fetched on its own
+        self.assertEqual(self.manager.fetches, [path])
+
+    def test_001_add_and_remove(self):
+        path = self.plug(1)
+        self.unplug(path)
+        self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [])
+        self.assertNotIn(path, self.manager.children)
+        self.assertEqual(self.manager.fetches, [])
+
+    def test_002_remove_and_add(self):
+        path = self.plug(1)
+        self.manager.flush_hotplug()
+        old = self.manager.children[path]
+        self.batches.clear()
+        self.unplug(path)
+        self.plug(1, backend='/vm/sys-usb2')
+        self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [([path], [path])])
+        self.assertIsNot(self.manager.children[path], old)
+        old.close.assert_called_once_with()
+        self.assertEqual(self.manager.by_backend.get('/vm/sys-usb'),
+                         frozenset())
+        self.assertEqual(self.manager.by_backend.get('/vm/sys-usb2'), {path})
+
+    def test_003_repeated_add(self):
+        path = self.plug(1)
+        self.manager._add(path)
+        self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [([path], [])])
+        self.assertEqual(self.manager.fetches, [path])
+
+    def test_004_repeated_add_of_present_device(self):
+        path = self.plug(1)
+        self.manager.flush_hotplug()
+        old = self.manager.children[path]
+        self.batches.clear()
+        self.manager._add(path)
+        self.manager.flush_hotplug()
+        # replaced by a fresh model, the old one may be stale
+        self.assertEqual(self.batches, [([path], [path])])
+        self.assertIsNot(self.manager.children[path], old)
+
+    def test_005_remove(self):
+        path = self.plug(1)
+        self.manager.flush_hotplug()
+        self.batches.clear()
+        self.unplug(path)
+        self.unplug(DEV % 2)  # unknown
+        self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [([], [path])])
+        self.assertEqual(self.manager.children, {})
+
+    def test_006_batch(self):
+        paths = [self.plug(number) for number in range(3)]
+        # gone before the batch is applied
+        self.manager.present.pop(paths[1])
+        self.manager.flush_hotplug()
+        self.assertEqual(self.manager.fetches, ['GetManagedObjects'])
+        self.assertEqual(self.batches, [([paths[0], paths[2]], [])])
+        self.assertEqual(set(self.manager.children), {paths[0], paths[2]})
+
+    def test_007_failed_fetch(self):
+        path = self.plug(1)
+        self.manager.present.clear()
+
+        def _fail(*args, **kwargs):
+            raise qui.models.qubes.dbus.DBusException('gone')
+
+        with unittest.mock.patch.object(self.manager, '_new_child', _fail):
+            with self.assertLogs('qui.models.qubes'):
+                self.manager.flush_hotplug()
+        self.assertEqual(self.batches, [])
+        self.assertNotIn(path, self.manager.children)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+''' Tests of `qui.sections` '''
+# pylint: disable=missing-docstring
+
+import random
+import unittest
+
+import qui.sections
+
+SEPARATOR = '--'
+
+
+class FakeMenu():
+    ''' The menu items as a list, changed at the positions returned by
+        `Sections` the way the trays do
+    '''
+
+    def __init__(self, names=()):
+        self.sections = qui.sections.Sections(names)
+        self.items = [SEPARATOR] * max(len(self.sections) - 1, 0)
+
+    def add_section(self, name, index=None):
+        position = self.sections.add_section(name, index)
+        if len(self.sections) > 1:
+            self.items.insert(position, SEPARATOR)
+
+    def remove_section(self, name):
+        position = self.sections.remove_section(name)
+        if self.sections:
+            assert self.items[position] == SEPARATOR, (self.items, position)
+            del self.items[position]
+
+    def insert(self, name, key):
+        self.items.insert(self.sections.insert(name, key), key)
+
+    def remove(self, name, key):
+        position = self.sections.remove(name, key)
+        assert self.items[position] == key
+        del self.items[position]
+
+    def expected(self):
+        ''' The items as they should be, computed from the sections '''
+        items = []
+        for index, section in enumerate(self.sections):
+            if index > 0:
+                items.append(SEPARATOR)
+            items.extend(section)
+        return items
+
+
+class TC_00_Section(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def test_000_sorted(self):
+        section = qui.sections.Section('usb')
+        self.assertEqual(section.insert('b'), 0)
+        self.assertEqual(section.insert('a'), 0)
+        self.assertEqual(section.insert('c'), 2)
+        self.assertEqual(list(section), ['a', 'b', 'c'])
+        self.assertEqual(section.remove('b'), 1)
+        self.assertEqual(section.index('c'), 1)
+
+    def test_001_missing(self):
+        section = qui.sections.Section('usb')
+        section.insert('a')
+        with self.assertRaises(KeyError):
+            section.index('b')
+        with self.assertRaises(KeyError):
+            section.remove('0')
+
+
+class TC_01_Sections(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def test_000_positions(self):
+        menu = FakeMenu(['block', 'mic', 'usb'])
+        menu.insert('usb', 'u2')
+        menu.insert('block', 'b1')
+        menu.insert('usb', 'u1')
+        menu.insert('mic', 'm1')
+        self.assertEqual(menu.items,
+                         ['b1', SEPARATOR, 'm1', SEPARATOR, 'u1', 'u2'])
+        self.assertEqual(menu.sections.offset('usb'), 4)
+        self.assertEqual(menu.sections.position('usb', 'u2'), 5)
+        menu.remove('block', 'b1')
+        self.assertEqual(menu.items, [SEPARATOR, 'm1', SEPARATOR, 'u1', 'u2'])
+        self.assertEqual(menu.sections.offset('mic'), 1)
+
+    def test_001_add_section_in_front(self):
+        menu = FakeMenu(['b'])
+        menu.insert('b', 'b1')
+        menu.insert('b', 'b2')
+        menu.add_section('a', 0)
+        self.assertEqual(menu.items, [SEPARATOR, 'b1', 'b2'])
+        self.assertEqual(menu.sections.offset('a'), 0)
+        self.assertEqual(menu.sections.offset('b'), 1)
+        menu.insert('a', 'a1')
+        self.assertEqual(menu.items, ['a1', SEPARATOR, 'b1', 'b2'])
+        self.assertEqual(menu.items, menu.expected())
+
+    def test_002_add_section_between(self):
+        menu = FakeMenu(['a', 'c'])
+        menu.insert('a', 'a1')
+        menu.insert('c', 'c1')
+        menu.add_section('b', 1)
+        menu.insert('b', 'b1')
+        self.assertEqual(menu.items,
+                         ['a1', SEPARATOR, 'b1', SEPARATOR, 'c1'])
+
+    def test_003_add_first_section(self):
+        menu = FakeMenu()
+        menu.add_section('a', 0)
+        self.assertEqual(menu.items, [])
+        menu.insert('a', 'a1')
+        self.assertEqual(menu.items, ['a1'])
+
+    def test_004_remove_first_section(self):
+        menu = FakeMenu(['a', 'b'])
+        menu.insert('a', 'a1')
+        menu.insert('b', 'b1')
+        menu.remove('a', 'a1')
+        menu.remove_section('a')
+        self.assertEqual(menu.items, ['b1'])
+        self.assertEqual(menu.sections.offset('b'), 0)
+        menu.insert('b', 'b0')
+        self.assertEqual(menu.items, ['b0', 'b1'])
+
+    def test_005_remove_last_section(self):
+        menu = FakeMenu(['a', 'b'])
+        menu.insert('a', 'a1')
+        menu.remove_section('b')
+        self.assertEqual(menu.items, ['a1'])
+        menu.remove('a', 'a1')
+        menu.remove_section('a')
+        self.assertEqual(menu.items, [])
+        self.assertEqual(len(menu.sections), 0)
+
+    def test_006_remove_missing_section(self):
+        menu = FakeMenu(['a'])
+        with self.assertRaises(KeyError):
+            menu.sections.offset('b')
+        with self.assertRaises(KeyError):
+            menu.sections.remove_section('b')
+
+    def test_007_random(self):
+        rand = random.Random(0)
+        menu = FakeMenu()
+        keys = {}
+        for _ in range(500):
+            name = rand.choice('abcde')
+            if name not in menu.sections:
+                names = sorted([section.name for section in menu.sections]
+                               + [name])
+                menu.add_section(name, names.index(name))
+            section_keys = keys.setdefault(name, set())
+            if section_keys and rand.random() < 0.4:
+                key = rand.choice(sorted(section_keys))
+                section_keys.remove(key)
+                menu.remove(name, key)
+                if not section_keys:
+                    menu.remove_section(name)
+            else:
+                key = '%s%d' % (name, rand.randrange(1000))
+                if key in section_keys:
+                    continue
+                section_keys.add(key)
+                menu.insert(name, key)
+            self.assertEqual(menu.items, menu.expected())
+
+
+if __name__ == '__main__':
+    unittest.main()
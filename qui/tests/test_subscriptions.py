@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+''' Tests of `qui.subscriptions` '''
+# pylint: disable=missing-docstring,protected-access
+
+import gc
+import unittest
+
+import qui.subscriptions
+
+
+class FakeSubscription():
+    ''' Stands in for a `dbus.connection.SignalMatch` '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.removed = 0
+
+    def remove(self):
+        self.removed += 1
+
+
+class Owner():
+    ''' An owner which isn't a widget '''
+    # pylint: disable=too-few-public-methods
+
+    def handler(self):
+        return self
+
+
+class TC_00_SubscriptionManager(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        self.manager = qui.subscriptions.SubscriptionManager()
+
+    def test_000_add(self):
+        owner = Owner()
+        self.manager.add(owner, 'Started', FakeSubscription())
+        self.manager.add(owner, 'Started', FakeSubscription())
+        self.manager.add(owner, 'Halted', FakeSubscription())
+        self.assertEqual(self.manager.live(), 3)
+        self.assertEqual(self.manager.live('Started'), 2)
+        self.assertEqual(self.manager.counts(), {'Started': 2, 'Halted': 1})
+
+    def test_001_release(self):
+        owner = Owner()
+        subscriptions = [FakeSubscription(), FakeSubscription()]
+        for subscription in subscriptions:
+            self.manager.add(owner, 'Started', subscription)
+        self.manager.release(owner)
+        self.assertEqual(self.manager.live(), 0)
+        self.assertEqual(self.manager.counts(), {})
+        self.assertEqual([s.removed for s in subscriptions], [1, 1])
+        self.assertEqual(self.manager._owned, {})
+
+    def test_002_finalize(self):
+        owner = Owner()
+        subscription = FakeSubscription()
+        self.manager.add(owner, 'Started', subscription)
+        del owner
+        gc.collect()
+        self.assertEqual(self.manager.live(), 0)
+        self.assertEqual(subscription.removed, 1)
+        self.assertEqual(self.manager._owned, {})
+
+    def test_003_remove_one(self):
+        owner = Owner()
+        tracked = self.manager.add(owner, 'Started', FakeSubscription())
+        kept = self.manager.add(owner, 'Halted', FakeSubscription())
+        tracked.remove()
+        tracked.remove()
+        self.assertEqual(tracked.subscription, None)
+        self.assertEqual(self.manager.counts(), {'Halted': 1})
+        self.assertEqual(self.manager._owned, {id(owner): [kept]})
+        kept.remove()
+        self.assertEqual(self.manager._owned, {})
+
+    def test_004_release_twice(self):
+        owner = Owner()
+        subscription = FakeSubscription()
+        self.manager.add(owner, 'Started', subscription)
+        self.manager.release(owner)
+        self.manager.release(owner)
+        self.assertEqual(subscription.removed, 1)
+        self.assertEqual(self.manager.live(), 0)
+
+
+class TC_01_weak_handler(unittest.TestCase):
+    # pylint: disable=invalid-name
+
+    def test_000_call(self):
+        owner = Owner()
+        handler = qui.subscriptions.weak_handler(owner.handler)
+        self.assertIs(handler(), owner)
+
+    def test_001_owner_gone(self):
+        owner = Owner()
+        handler = qui.subscriptions.weak_handler(owner.handler)
+        del owner
+        gc.collect()
+        self.assertIsNone(handler())
+
+
+if __name__ == '__main__':
+    unittest.main()
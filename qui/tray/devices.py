@@ -1,9 +1,14 @@
 # pylint: disable=missing-docstring
+import argparse
+import bisect
+import collections
 import signal
-import subprocess
 import sys
+import time
 
 # pylint: disable=wrong-import-position,ungrouped-imports
+import qui.profiling  # first, to measure the import time
+
 import dbus
 import dbus.mainloop.glib
 dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)  # isort:skip
@@ -11,129 +16,180 @@ dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)  # isort:skip
 import gi
 gi.require_version('Gtk', '3.0')  # isort:skip
 gi.require_version('AppIndicator3', '0.1')  # isort:skip
-from gi.repository import Gtk  # isort:skip
+from gi.repository import GLib, Gtk  # isort:skip
 from gi.repository import AppIndicator3 as appindicator  # isort:skip
 
-import qubesadmin
-
+import qui.admin
 import qui.decorators
 import qui.models.qubes
+import qui.notify
+import qui.sections
+import qui.subscriptions
+import qui.workers
 
-DEVICES = qui.models.qubes.DevicesManager()
-DOMAINS = qui.models.qubes.DomainManager()
-LABELS = qui.models.qubes.LabelsManager()
-QUBES_APP = qubesadmin.Qubes()
-
-DBUS = dbus.SessionBus()
+from typing import Callable, Dict, Iterable, List, Tuple  # pylint: disable=unused-import
 
 # TODO Replace pci with usb & mic when they are ready
 DEV_TYPES = ['block', 'usb', 'mic']
 
+# Number of device submenus built per main loop iteration at startup
+SUBMENUS_PER_IDLE = 10
 
-class DomainMenuItem(Gtk.ImageMenuItem):
-    ''' A submenu item for the device menu. Allows attaching and detaching the device to a domain. '''
 
-    def __init__(self, dev: qui.models.qubes.Device,
-                 dbus_vm: qui.models.qubes.Domain, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+def _devices() -> qui.models.qubes.DevicesManager:
+    return qui.models.qubes.registry().devices
 
-        self.dbus_vm = dbus_vm
-        self.vm = QUBES_APP.domains[self.dbus_vm['name']]
 
-        self.dev = dev
-        if self.dev.frontend_domain is None:
-            self.attached = False
-        elif self.dev.frontend_domain['name'] == self.dbus_vm['name']:
-            self.attached = True
-        else:
-            self.attached = False
+def _domains() -> qui.models.qubes.DomainManager:
+    return qui.models.qubes.registry().domains
 
-        icon = LABELS[self.dbus_vm['label']]['icon']
-        self.set_image(qui.decorators.create_icon(icon))
-        self._hbox = qui.decorators.device_domain_hbox(self.dbus_vm,
-                                                       self.attached)
-        self.dev_class = str(self.dev['dev_class'])
 
-        self.add(self._hbox)
+def _labels() -> qui.models.qubes.LabelsManager:
+    return qui.models.qubes.registry().labels
 
-        dev_ident = str(self.dev['ident'])
 
-        backend_vm_name = str(self.dev.backend_domain['name'])
-        backend_vm = QUBES_APP.domains[backend_vm_name]
+class RunningDomains():
+    ''' The running domains, sorted by name, which devices can be attached
+        to. A single instance is shared by all `DomainMenu` objects, so every
+        domain signal is handled once instead of once per device.
 
-        self.assignment = qubesadmin.devices.DeviceAssignment(
-            backend_vm, dev_ident, persistent=False)
+        `generation` is incremented on every change.
+    '''
 
-    def attach(self):
-        assert not self.attached
-        self.attached = True
+    def __init__(self):
+        self.generation = 0
+        self._entries = []  # type: List[Tuple[str, dbus.ObjectPath]]
+        self._names = {}  # type: Dict[dbus.ObjectPath, str]
 
-        self.remove(self._hbox)
-        self._hbox = qui.decorators.device_domain_hbox(self.dbus_vm,
-                                                       self.attached)
-        self.add(self._hbox)
-        self.show_all()
+        domains = _domains()
+        for vm_obj_path in domains.by_state.get('Started'):
+            self.add_vm(None, vm_obj_path)
 
-    def detach(self):
-        assert self.attached
-        self.attached = False
-        self.remove(self._hbox)
-        self._hbox = qui.decorators.device_domain_hbox(self.dbus_vm,
-                                                       self.attached)
-        self.add(self._hbox)
-        self.show_all()
+        # removed when this object is garbage collected
+        weak_handler = qui.subscriptions.weak_handler
+        for signal_name, handler_function in (
+                ('Started', self.add_vm), ('DomainRemoved', self.remove_vm),
+                ('Halted', self.remove_vm), ('Failed', self.remove_vm),
+                ('Unknown', self.remove_vm)):
+            qui.subscriptions.SUBSCRIPTIONS.add(
+                self, signal_name, domains.connect_to_signal(
+                    signal_name, weak_handler(handler_function)))
+
+    def add_vm(self, _, vm_obj_path):
+        vm = _domains().children.get(vm_obj_path)
+        if vm is None or vm['name'] == 'dom0' or vm_obj_path in self._names:
+            return
+        name = vm['name']
+        bisect.insort(self._entries, (name, vm_obj_path))
+        self._names[vm_obj_path] = name
+        self.generation += 1
+
+    def remove_vm(self, _, vm_obj_path):
+        try:
+            name = self._names.pop(vm_obj_path)
+        except KeyError:
+            return
+        index = bisect.bisect_left(self._entries, (name, vm_obj_path))
+        del self._entries[index]
+        self.generation += 1
+
+    def __iter__(self):
+        return (vm_obj_path for _, vm_obj_path in self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DomainMenuItem(Gtk.ImageMenuItem):
+    ''' A submenu item for the device menu. Allows attaching and detaching the device to a domain. '''
+
+    def __init__(self, dbus_vm: qui.models.qubes.Domain, attached: bool,
+                 busy: bool=False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.dbus_vm = dbus_vm
+        self.vm = qui.admin.cached_qubes().vm(dbus_vm.object_path)
+        self.attached = attached
+
+        icon = _labels()[self.dbus_vm['label']]['icon']
+        self.set_image(qui.decorators.create_icon(icon))
+        hbox = qui.decorators.device_domain_hbox(self.dbus_vm, self.attached)
+        if busy:
+            # An attach or detach operation is in progress
+            spinner = Gtk.Spinner()
+            spinner.start()
+            hbox.pack_start(spinner, False, True, 0)
+            self.set_sensitive(False)
+        self.add(hbox)
 
 
 class DomainMenu(Gtk.Menu):
-    def __init__(self, dev: qui.models.qubes.Device, *args, **kwargs):
+    ''' The "attach to" submenu of a device.
+
+        The items are only built when the menu is shown, from the shared
+        `RunningDomains`. The only state kept per device is the domain it is
+        attached to.
+    '''
+
+    def __init__(self, dev: qui.models.qubes.Device,
+                 running_domains: RunningDomains,
+                 notifier: qui.notify.Notifier,
+                 workers: qui.workers.WorkerPool, *args, **kwargs):
         super(DomainMenu, self).__init__(*args, **kwargs)
         self.dev = dev
-        self.menu_items = {}
-        self.attached_item = None
-
-        for vm_obj_path, vm in DOMAINS.children.items():
-            if vm_obj_path != dev['backend_domain']\
-            and vm['state'] == 'Started'\
-            and vm['name'] != 'dom0':
-                self.add_vm(None, vm_obj_path)
-
-        DOMAINS.connect_to_signal('Started', self.add_vm)
-        DOMAINS.connect_to_signal('DomainAdded', self.add_vm)
-        DOMAINS.connect_to_signal('DomainRemoved', self.remove_vm)
-        DOMAINS.connect_to_signal('Halted', self.remove_vm)
-        DOMAINS.connect_to_signal('Failed', self.remove_vm)
-        DOMAINS.connect_to_signal('Unknown', self.remove_vm)
-        self.dev.connect_to_signal('Attached', self.dev_attached)
-        self.dev.connect_to_signal('Detached', self.dev_detached)
-
-    def add_vm(self, _, obj_path):
-        vm = DOMAINS.children[obj_path]
-        menu_item = DomainMenuItem(self.dev, vm)
-        menu_item.connect('activate', self.toggle)
-        if menu_item.attached:
-            assert self.attached_item is None,\
-                "%s attached to two domains(%s & %s)"\
-                % (self.dev['ident'], self.attached_item.dbus_vm['name'], menu_item.dbus_vm['name'])
-            self.attached_item = menu_item
+        self.running_domains = running_domains
+        self.notifier = notifier
+        self.workers = workers
+        self.attached_to = dev['frontend_domain']  # type: dbus.ObjectPath
+        # domain with a pending attach or detach operation
+        self.busy_vm = None  # type: dbus.ObjectPath
+        self._built = None
+
+        self.connect('show', self.populate)
+        # removed when the device item and with it this menu is destroyed
+        subscriptions = qui.subscriptions.SUBSCRIPTIONS
+        subscriptions.add(self, 'Attached', self.dev.connect_to_signal(
+            'Attached', self.dev_attached))
+        subscriptions.add(self, 'Detached', self.dev.connect_to_signal(
+            'Detached', self.dev_detached))
+
+    def populate(self, *_args):
+        ''' (Re)build the menu items, if anything changed since the last
+            time.
+        '''
+        state = (self.running_domains.generation, self.attached_to,
+                 self.busy_vm)
+        if state == self._built:
+            return
 
-        self.menu_items[str(obj_path)] = menu_item
-        self.append(menu_item)
-        self.show_all()
+        for menu_item in self.get_children():
+            menu_item.destroy()
+
+        for vm_obj_path in self.running_domains:
+            if vm_obj_path == self.dev['backend_domain']:
+                continue
+            menu_item = DomainMenuItem(_domains().children[vm_obj_path],
+                                       vm_obj_path == self.attached_to,
+                                       vm_obj_path == self.busy_vm)
+            menu_item.connect('activate', self.toggle)
+            self.append(menu_item)
 
-    def remove_vm(self, _, vm_obj_path):
-        menu_item = self.menu_items[vm_obj_path]
-        self.remove(menu_item)
         self.show_all()
+        self._built = state
+
+    def _refresh(self):
+        self._built = None
+        if self.get_visible():
+            self.populate()
 
     def dev_attached(self, vm_obj_path):
-        menu_item = self.menu_items[vm_obj_path]
-        menu_item.attach()
-        self.attached_item = menu_item
+        self.attached_to = vm_obj_path
+        self._refresh()
 
     def dev_detached(self, vm_obj_path):
-        menu_item = self.menu_items[vm_obj_path]
-        menu_item.detach()
-        self.attached_item = None
+        # pylint: disable=unused-argument
+        self.attached_to = None
+        self._refresh()
 
     def toggle(self, menu_item):
         if menu_item.attached:
@@ -142,146 +198,218 @@ class DomainMenu(Gtk.Menu):
             self.attach(menu_item)
 
     def attach(self, menu_item):
-        vm_name = menu_item.vm.name
-
-        if self.attached_item is not None:
+        if self.attached_to is not None:
             self.detach()
 
-        menu_item.vm.devices[menu_item.dev_class].attach(menu_item.assignment)
-
-        subprocess.call([
-            'notify-send',
-            "Attaching %s to %s" % (self.dev.name, menu_item.vm)
-        ])
+        vm_obj_path = menu_item.dbus_vm.object_path
+        self._submit('attach', vm_obj_path)
+        self.notifier.notify(
+            "Attaching %s to %s" % (self.dev.name, menu_item.vm),
+            key=self.dev.object_path)
 
     def detach(self):
-        menu_item = self.attached_item
-        menu_item.vm.devices[menu_item.dev_class].detach(menu_item.assignment)
-        vm_name = menu_item.dbus_vm['name']
-        subprocess.call([
-            'notify-send',
-            "Detaching %s from %s" % (self.dev.name, vm_name)
-        ])
+        self._submit('detach', self.attached_to)
+        vm_name = _domains().children[self.attached_to]['name']
+        self.notifier.notify(
+            "Detaching %s from %s" % (self.dev.name, vm_name),
+            key=self.dev.object_path)
+
+    def _submit(self, action, vm_obj_path):
+        ''' Run the attach or detach `action` in the worker pool. Operations
+            on the same device are run in order.
+        '''
+        admin = qui.admin.cached_qubes()
+        collection = admin.devices(vm_obj_path, self.dev['dev_class'])
+        func = getattr(collection, action)
+        assignment = admin.assignment(self.dev.object_path)
+
+        def _done(_result):
+            self._operation_finished()
+
+        def _error(error):
+            self._operation_finished()
+            self.notifier.notify(
+                "Failed to %s %s: %s" % (action, self.dev.name, error),
+                key=self.dev.object_path)
+
+        self.busy_vm = vm_obj_path
+        self._refresh()
+        self.workers.submit(self.dev.object_path, 'device-' + action, func,
+                            assignment, on_done=_done, on_error=_error)
+
+    def _operation_finished(self):
+        if not self.workers.pending(self.dev.object_path):
+            self.busy_vm = None
+            self._refresh()
 
 
 class DeviceItem(Gtk.ImageMenuItem):
     ''' MenuItem showing the device data and a :class:`DomainMenu`. '''
 
-    def __init__(self, dev_obj_path: dbus.ObjectPath, *args, **kwargs):
-        "docstring"
+    def __init__(self, dev_obj_path: dbus.ObjectPath,
+                 running_domains: RunningDomains,
+                 notifier: qui.notify.Notifier,
+                 workers: qui.workers.WorkerPool, *args,
+                 defer_submenu: bool=False, **kwargs):
+        ''' If `defer_submenu` is set, `build_submenu()` has to be called
+            later.
+        '''
         super().__init__(*args, **kwargs)
+        self.running_domains = running_domains
+        self.notifier = notifier
+        self.workers = workers
 
-        self.dev = DEVICES[dev_obj_path]  # type: qui.models.qubes.Device
+        self.dev = _devices()[dev_obj_path]  # type: qui.models.qubes.Device
         self.dev_class = self.dev["dev_class"]
         label_path = self.dev.backend_domain['label']  # type: dbus.ObjectPath
-        vm_icon = LABELS[label_path]["icon"]  # type: Gtk.Image
+        vm_icon = _labels()[label_path]["icon"]  # type: Gtk.Image
         hbox = qui.decorators.device_hbox(self.dev)  # type: Gtk.Box
 
         self.set_image(qui.decorators.create_icon(vm_icon))
         self.obj_path = dev_obj_path
         self.add(hbox)
-        submenu = DomainMenu(self.dev)
+        if not defer_submenu:
+            self.build_submenu()
+
+    def build_submenu(self):
+        submenu = DomainMenu(self.dev, self.running_domains, self.notifier,
+                             self.workers)
         self.set_submenu(submenu)
+        # With an indicator the submenu is rendered by the panel, so it may
+        # never be shown locally.
+        self.connect('activate', submenu.populate)
 
 
 class DeviceGroups():
-    def __init__(self, menu: Gtk.Menu):
-        self.positions = {}
-        self.separators = {}
-        self.counters = {}
+    ''' The device items of the tray menu, in one section per device class
+        sorted by device name.
+    '''
+
+    def __init__(self, menu: Gtk.Menu, notifier: qui.notify.Notifier,
+                 workers: qui.workers.WorkerPool):
+        self.running_domains = RunningDomains()
+        self.notifier = notifier
+        self.workers = workers
         self.menu = menu
-        self.menu_items = []
-
-        for pos, dev_type in enumerate(DEV_TYPES):
-            self.counters[dev_type] = 0
-            if dev_type == DEV_TYPES[0]:
-                separator = None
-            else:
-                separator = Gtk.SeparatorMenuItem()
-                self.menu.add(separator)
-
-            self.positions[dev_type] = pos
+        self.sections = qui.sections.Sections(DEV_TYPES)
+        self.separators = {}  # type: Dict[str, Gtk.SeparatorMenuItem]
+        self.menu_items = {}  # type: Dict[dbus.ObjectPath, DeviceItem]
+        # object path -> sort key in the section
+        self._keys = {}  # type: Dict[dbus.ObjectPath, Tuple[str, str]]
+
+        for dev_type in DEV_TYPES[1:]:
+            separator = Gtk.SeparatorMenuItem()
+            self.menu.insert(separator, self.sections.offset(dev_type) - 1)
             self.separators[dev_type] = separator
 
-        DEVICES.connect_to_signal("Added", self.add)
-        DEVICES.connect_to_signal("Removed", self.remove)
-
-    def add(self, dev_obj_path: dbus.ObjectPath):
-        dev = DEVICES[dev_obj_path]
-        if dev['dev_class'] not in DEV_TYPES:
-            return
-
-        position = self._position(dev['dev_class'])
-
-        self._insert(dev_obj_path, position)
-
-        if dev['dev_class'] not in [DEV_TYPES[0], DEV_TYPES[-1]]:
-            self.separators[dev['dev_class']].show()
-
-        subprocess.call(['notify-send', "Device %s is available" % (dev.name)])
-
-    def _position(self, dev_type):
-        if dev_type == DEV_TYPES[0]:
-            return 0
-        else:
-            return self.positions[dev_type] + 1
-
-    def _insert(self, dev_obj_path: dbus.ObjectPath, position: int) -> None:
-        dev = DEVICES[dev_obj_path]
-        menu_item = DeviceItem(dev_obj_path)
+        _devices().connect_batch(self.update)
+
+    def update(self, added: List[dbus.ObjectPath],
+               removed: List[dbus.ObjectPath]) -> None:
+        ''' Apply a batch of hotplugged devices from the `DevicesManager`.
+            Devices which are both removed and added are just rebuilt.
+        '''
+        devices = _devices()
+        replaced = set(added).intersection(removed)
+        changed = set()
+
+        for dev_obj_path in removed:
+            menu_item = self._remove(dev_obj_path)
+            if menu_item is None:
+                continue
+            changed.add(menu_item.dev_class)
+            if dev_obj_path not in replaced:
+                self.notifier.notify(
+                    "Device %s is removed" % (menu_item.dev.name),
+                    group='device-removed', group_summary='%d devices removed')
+
+        for dev_obj_path in added:
+            dev = devices[dev_obj_path]
+            if dev['dev_class'] not in DEV_TYPES:
+                continue
+            self._insert(dev_obj_path).show_all()
+            changed.add(dev['dev_class'])
+            if dev_obj_path not in replaced:
+                self.notifier.notify(
+                    "Device %s is available" % (dev.name),
+                    group='device-added', group_summary='%d devices available')
+
+        for dev_class in changed:
+            self._update_separator(dev_class)
+
+    def populate(self, dev_obj_paths: Iterable[dbus.ObjectPath],
+                 on_ready: Callable=None) -> None:
+        ''' Add the devices present at startup without notifications.
+
+            Only the menu rows are built right away, the submenus are built
+            when the main loop is idle. `on_ready()` is called afterwards.
+        '''
+        devices = _devices()
+        pending = collections.deque()
+        for dev_obj_path in dev_obj_paths:
+            if devices[dev_obj_path]['dev_class'] in DEV_TYPES:
+                menu_item = self._insert(dev_obj_path, defer_submenu=True)
+                menu_item.show_all()
+                pending.append(menu_item)
+        for dev_class in DEV_TYPES:
+            self._update_separator(dev_class)
+
+        def _build_submenus():
+            for _ in range(min(SUBMENUS_PER_IDLE, len(pending))):
+                menu_item = pending.popleft()
+                if menu_item.obj_path in self.menu_items:  # not removed yet
+                    menu_item.build_submenu()
+            if pending:
+                return True
+            if on_ready is not None:
+                on_ready()
+            return False
+
+        GLib.idle_add(_build_submenus)
+
+    def _insert(self, dev_obj_path: dbus.ObjectPath,
+                defer_submenu: bool=False) -> 'DeviceItem':
+        ''' Add the menu item, the caller updates the separators '''
+        dev = _devices()[dev_obj_path]
+        key = (dev.name, str(dev_obj_path))
+        position = self.sections.insert(dev['dev_class'], key)
+        self._keys[dev_obj_path] = key
+
+        menu_item = DeviceItem(dev_obj_path, self.running_domains,
+                               self.notifier, self.workers,
+                               defer_submenu=defer_submenu)
         self.menu.insert(menu_item, position)
-        self.counters[dev["dev_class"]] += 1
-        self.menu_items.append(menu_item)
-        self._shift_positions(dev["dev_class"])
-        self._recalc_separators()
-        menu_item.show_all()
-
-    def remove(self, dev_obj_path: dbus.ObjectPath):
-        for item in self.menu_items:
-            if item.obj_path == dev_obj_path:
-                self.menu.remove(item)
-                self.counters[item.dev_class] -= 1
-                self._unshift_positions(item.dev_class)
-                self._recalc_separators()
-                subprocess.call(
-                    ['notify-send',
-                     "Device %s is removed" % (item.dev.name)])
-                return
-
-    def _recalc_separators(self):
-        for dev_type, size in self.counters.items():
-            separator = self.separators[dev_type]
-            if separator is not None:
-                if size > 0:
-                    separator.show()
-                else:
-                    separator.hide()
-
-    def _shift_positions(self, dev_type):
-        if dev_type == DEV_TYPES[-1]:
-            return
+        self.menu_items[dev_obj_path] = menu_item
+        return menu_item
 
-        start_index = DEV_TYPES.index(dev_type)
-        index_to_update = DEV_TYPES[start_index:]
+    def _remove(self, dev_obj_path: dbus.ObjectPath) -> 'DeviceItem':
+        ''' Remove the menu item, the caller updates the separators '''
+        menu_item = self.menu_items.pop(dev_obj_path, None)
+        if menu_item is None:
+            return None
+        self.sections.remove(menu_item.dev_class, self._keys.pop(dev_obj_path))
+        self.menu.remove(menu_item)
+        menu_item.destroy()
+        return menu_item
 
-        for index in index_to_update:
-            self.positions[index] += 1
-
-    def _unshift_positions(self, dev_type):
-        if dev_type in [DEV_TYPES[0], DEV_TYPES[-1]]:
-            return
-
-        for index in DEV_TYPES[1:]:
-            assert self.positions[index] > 0
-            self.positions[index] -= 1
+    def _update_separator(self, dev_type):
+        separator = self.separators.get(dev_type)
+        if separator is not None:
+            separator.set_visible(bool(self.sections[dev_type]))
 
 
 class DevicesTray(Gtk.Application):
-    def __init__(self, app_name='Devices Tray'):
+    def __init__(self, app_name='Devices Tray', profile=None):
         super(DevicesTray, self).__init__()
         self.name = app_name
+        if profile is None:
+            profile = qui.profiling.StartupProfile()
+        self.profile = profile
         self.tray_menu = Gtk.Menu()
-        self.devices = DeviceGroups(self.tray_menu)
+        self.notifier = qui.notify.Notifier(app_name)
+        self.workers = qui.workers.WorkerPool()
+        self.devices = DeviceGroups(self.tray_menu, self.notifier,
+                                    self.workers)
 
         self.ind = appindicator.Indicator.new(
             'Devices Widget', "media-removable",
@@ -290,16 +418,36 @@ class DevicesTray(Gtk.Application):
         self.ind.set_menu(self.tray_menu)
 
     def run(self):  # pylint: disable=arguments-differ
-        for obj_path in DEVICES.children:
-            self.devices.add(obj_path)
+        submenus_started = time.monotonic()
+
+        def _submenus_ready():
+            self.profile.add('device submenus',
+                             time.monotonic() - submenus_started)
+            self.profile.report()
 
-        self.tray_menu.show_all()
+        with self.profile.phase('model build'):
+            self.devices.populate(_devices().children,
+                                  on_ready=_submenus_ready)
+        self.profile.first_render()
 
         Gtk.main()
+        self.workers.shutdown()
 
 
 def main():
-    app = DevicesTray()
+    profile = qui.profiling.StartupProfile()
+    profile.imports_done()
+    parser = argparse.ArgumentParser(description='Qubes devices tray')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the duration of the startup phases')
+    args = parser.parse_args()
+
+    profile.enabled = args.profile_startup
+    with profile.phase('bus sync'):
+        qui.models.qubes.registry().sync()
+        qui.admin.cached_qubes()
+
+    app = DevicesTray(profile=profile)
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     app.run()
 
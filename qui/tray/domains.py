@@ -2,23 +2,34 @@
 # -*- coding: utf-8 -*-
 ''' A menu listing domains '''
 
+import argparse
+import bisect
+import functools
 import signal
-import subprocess
 import sys
 from enum import Enum
 
+import qui.profiling  # first, to measure the import time
+
+# pylint: disable=wrong-import-position
 import dbus
 import dbus.mainloop.glib
 dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
 
-# pylint: disable=wrong-import-position
 import qui.decorators
+import qui.history
+import qui.logviewer
+import qui.models.qubes
+import qui.notify
+import qui.sections
+import qui.subscriptions
+import qui.updates
 
-from qui.models.qubes import DomainManager
+from typing import Any, Callable, Dict, List, Tuple  # pylint: disable=unused-import
 
 import gi  # isort:skip
 gi.require_version('Gtk', '3.0')  # isort:skip
-from gi.repository import GObject, Gtk  # isort:skip
+from gi.repository import Gio, GObject, Gtk  # isort:skip
 
 gi.require_version('AppIndicator3', '0.1')  # isort:skip
 from gi.repository import AppIndicator3 as appindicator  # isort:skip
@@ -28,12 +39,58 @@ DOMAIN_MANAGER_PATH = "/org/qubes/DomainManager1"
 DBusSignalMatch = dbus.connection.SignalMatch
 
 
+# Order of the domain classes when sorting or grouping by class
+CLASS_ORDER = ('AdminVM', 'AppVM', 'DispVM', 'StandaloneVM', 'TemplateVM')
+
+
 class STATE(Enum):
     FAILED = 1
     TRANSIENT = 2
     RUNNING = 3
 
 
+def _label_index(vm) -> int:
+    label = qui.models.qubes.registry().labels.children.get(vm['label'])
+    if label is None:
+        return 0
+    return label.get('index') or 0
+
+
+def _class_index(vm) -> int:
+    try:
+        return CLASS_ORDER.index(vm['klass'])
+    except ValueError:
+        return len(CLASS_ORDER)
+
+
+def _memory(vm) -> int:
+    # largest first
+    return -(vm['memory_usage'] or 0)
+
+
+#: Primary sort keys of the domain items, domains with the same key are
+#: sorted by name
+SORT_KEYS = {
+    'name': lambda vm: '',
+    'label': _label_index,
+    'class': _class_index,
+    'memory': _memory,
+}  # type: Dict[str, Callable[[Any], Any]]
+
+#: Keys of the groups the domain items can be separated in
+GROUP_KEYS = {
+    'none': lambda vm: 0,
+    'label': _label_index,
+    'class': _class_index,
+}  # type: Dict[str, Callable[[Any], Any]]
+
+# Domain properties the sort and group keys depend on
+SORT_PROPERTIES = frozenset(['name', 'label', 'klass', 'memory_usage'])
+
+# Number of memory samples shown in the sparklines
+SPARKLINE_WIDTH = 12
+
+
 def vm_label(decorator):
     hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
     hbox.pack_start(decorator.icon(), False, True, 0)
@@ -43,8 +100,7 @@ def vm_label(decorator):
 
 
 def sub_menu_hbox(name, image_name=None) -> Gtk.Widget:
-    icon = Gtk.IconTheme.get_default().load_icon(image_name, 16, 0)
-    image = Gtk.Image.new_from_pixbuf(icon)
+    image = qui.decorators.create_icon(image_name)
 
     hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
     hbox.pack_start(image, False, False, 0)
@@ -59,14 +115,16 @@ class ShutdownItem(Gtk.ImageMenuItem):
         super().__init__()
         self.vm = vm
 
-        icon = Gtk.IconTheme.get_default().load_icon('media-playback-stop', 16,
-                                                     0)
-        image = Gtk.Image.new_from_pixbuf(icon)
+        image = qui.decorators.create_icon('media-playback-stop')
 
         self.set_image(image)
         self.set_label('Shutdown')
 
-        self.connect('activate', self.vm.Shutdown)
+        self.connect('activate', self.shutdown)
+
+    def shutdown(self, _item):
+        ''' Ask the domain to shut down without blocking the main loop '''
+        self.vm.call_async('Shutdown')
 
 
 class KillItem(Gtk.ImageMenuItem):
@@ -76,13 +134,16 @@ class KillItem(Gtk.ImageMenuItem):
         super().__init__()
         self.vm = vm
 
-        icon = Gtk.IconTheme.get_default().load_icon('media-record', 16, 0)
-        image = Gtk.Image.new_from_pixbuf(icon)
+        image = qui.decorators.create_icon('media-record')
 
         self.set_image(image)
         self.set_label('Kill')
 
-        self.connect('activate', self.vm.Kill)
+        self.connect('activate', self.kill)
+
+    def kill(self, _item):
+        ''' Kill the domain without blocking the main loop '''
+        self.vm.call_async('Kill')
 
 
 class PreferencesItem(Gtk.ImageMenuItem):
@@ -91,9 +152,7 @@ class PreferencesItem(Gtk.ImageMenuItem):
     def __init__(self, vm):
         super().__init__()
         self.vm = vm
-        icon = Gtk.IconTheme.get_default().load_icon('preferences-system', 16,
-                                                     0)
-        image = Gtk.Image.new_from_pixbuf(icon)
+        image = qui.decorators.create_icon('preferences-system')
 
         self.set_image(image)
         self.set_label('Preferences')
@@ -101,20 +160,32 @@ class PreferencesItem(Gtk.ImageMenuItem):
         self.connect('activate', self.launch_preferences_dialog)
 
     def launch_preferences_dialog(self, _item):
-        subprocess.call(['qubes-vm-settings', self.vm['name']])
+        ''' Start `qubes-vm-settings` without waiting for it to exit '''
+        Gio.Subprocess.new(['qubes-vm-settings', self.vm['name']],
+                           Gio.SubprocessFlags.NONE)
 
 
 class LogItem(Gtk.ImageMenuItem):
-    def __init__(self, vm, name, callback=None):
+    ''' Log menu Item. When activated shows the log `log_name` of the domain
+        in a `qui.logviewer.LogViewer`, unless a `callback` is given.
+    '''
+
+    def __init__(self, vm, name, log_name=None, callback=None):
         super().__init__()
-        image = Gtk.Image.new_from_file(
+        self.vm = vm
+        self.log_name = log_name
+        image = qui.decorators.create_icon_from_file(
             "/usr/share/icons/HighContrast/16x16/apps/logviewer.png")
 
-        decorator = qui.decorators.DomainDecorator(vm)
         self.set_image(image)
         self.set_label(name)
         if callback:
             self.connect('activate', callback)
+        elif log_name is not None:
+            self.connect('activate', self.show_log)
+
+    def show_log(self, _item):
+        qui.logviewer.show_log(self.log_name, self.vm['name'])
 
 
 class StartedMenu(Gtk.Menu):
@@ -137,9 +208,9 @@ class DebugMenu(Gtk.Menu):
     def __init__(self, vm):
         super().__init__()
         self.vm = vm
-        console = LogItem(self.vm, "Console Log")
-        guid = LogItem(self.vm, "GUI Daemon Log")
-        qrexec = LogItem(self.vm, "Qrexec Log")
+        console = LogItem(self.vm, "Console Log", 'console')
+        guid = LogItem(self.vm, "GUI Daemon Log", 'guid')
+        qrexec = LogItem(self.vm, "Qrexec Log", 'qrexec')
         kill = KillItem(self.vm)
         preferences = PreferencesItem(self.vm)
 
@@ -151,9 +222,22 @@ class DebugMenu(Gtk.Menu):
 
 
 class DomainMenuItem(Gtk.ImageMenuItem):
-    def __init__(self, vm):
+    ''' The menu item of a domain. State changes update the widgets in place,
+        the submenus for the running and the other states are built once.
+    '''
+
+    def __init__(self, vm, updates: qui.updates.UpdateCoalescer,
+                 on_change: Callable=None, header: 'MemoryHeader'=None):
+        ''' `on_change(item)` is called after a property the menu order
+            depends on changed, see `SORT_PROPERTIES`. The memory usage is
+            reported to the `header`.
+        '''
         super().__init__()
         self.vm = vm
+        self.updates = updates
+        self.on_change = on_change
+        self.header = header
+        self.history = qui.history.RingBuffer()
 
         self.decorator = qui.decorators.DomainDecorator(vm)
 
@@ -161,21 +245,42 @@ class DomainMenuItem(Gtk.ImageMenuItem):
         self.name = self.decorator.name()
         hbox.pack_start(self.name, True, True, 0)
 
-        state = self._state()
+        self.spinner = Gtk.Spinner()
+        # only shown while the domain is in a transient state
+        self.spinner.set_no_show_all(True)
+        hbox.pack_start(self.spinner, False, True, 0)
 
-        if state not in [STATE.RUNNING, STATE.FAILED]:
-            spinner = Gtk.Spinner()
-            spinner.start()
-            hbox.pack_start(spinner, False, True, 0)
+        self.sparkline = Gtk.Label(xalign=1)
+        self.sparkline.set_sensitive(False)
+        hbox.pack_start(self.sparkline, False, True, 0)
 
         self.memory = self.decorator.memory()
         hbox.pack_start(self.memory, False, True, 0)
-        vm.proxy.connect_to_signal('PropertiesChanged', self._update, dbus_interface='org.freedesktop.DBus.Properties')
+        self._add_sample(vm['memory_usage'])
+        self.sparkline.set_text(
+            qui.history.sparkline(self.history, SPARKLINE_WIDTH))
+        # removed when the item is destroyed
+        qui.subscriptions.SUBSCRIPTIONS.add(
+            self, 'PropertiesChanged',
+            vm.connect_properties_changed(self._update))
 
         self.add(hbox)
 
-        self._set_submenu(state)
-        self._set_image(state)
+        self._started_menu = None  # type: StartedMenu
+        self._debug_menu = None  # type: DebugMenu
+        self.connect('destroy', self._destroy_submenus)
+        self.state = None  # type: STATE
+        self.update_state()
+
+    def _destroy_submenus(self, _item):
+        ''' Only the attached submenu is destroyed with the item, the other
+            cached one would keep its popup window and the model alive.
+        '''
+        for submenu in (self._started_menu, self._debug_menu):
+            if submenu is not None:
+                submenu.destroy()
+        self._started_menu = None
+        self._debug_menu = None
 
     def _state(self):
         if self.vm['state'] == 'Started':
@@ -185,46 +290,242 @@ class DomainMenuItem(Gtk.ImageMenuItem):
 
         return STATE.TRANSIENT
 
+    def update_state(self):
+        ''' Update the spinner, icon and submenu to the domain state '''
+        state = self._state()
+        if state == self.state:
+            return
+        self.state = state
+
+        if state == STATE.TRANSIENT:
+            self.spinner.start()
+            self.spinner.show()
+        else:
+            self.spinner.stop()
+            self.spinner.hide()
+
+        self._set_submenu(state)
+        self._set_image(state)
+
     def _set_image(self, state):
         if state == STATE.FAILED:
-            failed_pixbuf = Gtk.IconTheme.get_default().load_icon(
-                'media-record', 16, 0)
-            failed_image = Gtk.Image.new_from_pixbuf(failed_pixbuf)
-            self.set_image(failed_image)
+            self.set_image(qui.decorators.create_icon('media-record'))
         else:
             self.set_image(self.decorator.icon())
 
     def _set_submenu(self, state):
         if state == STATE.RUNNING:
-            submenu = StartedMenu(self.vm)
-        elif state == STATE.FAILED:
-            submenu = DebugMenu(self.vm)
-            remove = Gtk.MenuItem("Remove")
-            remove.connect('activate', lambda: self.hide)
+            if self._started_menu is None:
+                self._started_menu = StartedMenu(self.vm)
+                self._started_menu.show_all()
+            submenu = self._started_menu
         else:
-            submenu = DebugMenu(self.vm)
-        self.set_submenu(submenu)
-
+            if self._debug_menu is None:
+                self._debug_menu = DebugMenu(self.vm)
+                self._debug_menu.show_all()
+            submenu = self._debug_menu
+        if self.get_submenu() is not submenu:
+            self.set_submenu(submenu)
 
     def _update(self, _, changed_properties, invalidated=None):
+        ''' Queue the changes, they are applied at most
+            `self.updates.max_rate` times per second. Invalidated properties
+            are ignored, the model passes their new values here once it
+            fetched them.
+        '''
+        # pylint: disable=unused-argument
+        if not changed_properties:
+            return
+        if 'memory_usage' in changed_properties:
+            # Every sample is recorded, even if the label is updated less often
+            self._add_sample(changed_properties['memory_usage'])
+        self.updates.push(self, self._apply, dict(changed_properties))
+
+    def _add_sample(self, memory_usage):
+        if memory_usage is None:
+            return
+        self.history.append(memory_usage)
+        if self.header is not None:
+            self.header.update(self.vm.object_path, memory_usage)
+
+    def _apply(self, changed_properties):
         if 'memory_usage' in changed_properties:
-            text = str(int(changed_properties['memory_usage']/1024)) + ' MB'
+            text = str(self.vm['memory_usage'] // 1024) + ' MB'
             self.memory.set_text(text)
+            self.sparkline.set_text(
+                qui.history.sparkline(self.history, SPARKLINE_WIDTH))
 
-        if 'label' in changed_properties:
+        if 'state' in changed_properties:
+            self.update_state()
+
+        if 'label' in changed_properties and self.state != STATE.FAILED:
             self.set_image(self.decorator.icon())
 
+        if self.on_change is not None \
+                and not SORT_PROPERTIES.isdisjoint(changed_properties):
+            self.on_change(self)
+
+
+class MemoryHeader(Gtk.MenuItem):
+    ''' Menu row showing the total memory usage of the running domains, its
+        peak since the start and a sparkline of its history. Every point of
+        the sparkline is the highest total between two label updates.
+    '''
+
+    def __init__(self, updates: qui.updates.UpdateCoalescer):
+        super().__init__()
+        self.updates = updates
+        self.total = 0
+        self.peak = 0
+        self.history = qui.history.RingBuffer()
+        self._memory = {}  # type: Dict[dbus.ObjectPath, int]
+        # highest total since the last label update
+        self._interval_peak = 0
+        self.label = Gtk.Label(xalign=0)
+        self.add(self.label)
+        self.set_sensitive(False)
+        self._apply({})
+
+    def update(self, vm_path: dbus.ObjectPath, memory_usage: int) -> None:
+        ''' Set the memory usage of the domain at `vm_path` '''
+        self.total += memory_usage - self._memory.get(vm_path, 0)
+        self._memory[vm_path] = memory_usage
+        # every sample counts, even if the label is updated less often
+        self.peak = max(self.peak, self.total)
+        self._interval_peak = max(self._interval_peak, self.total)
+        self.updates.push(self, self._apply, {})
+
+    def watch(self, vm) -> None:
+        ''' Count the memory usage of `vm`, which has no item in the menu,
+            e.g. dom0
+        '''
+        self.update(vm.object_path, vm.get('memory_usage') or 0)
+        # removed when the header is destroyed
+        qui.subscriptions.SUBSCRIPTIONS.add(
+            self, 'PropertiesChanged', vm.connect_properties_changed(
+                functools.partial(self._watched_changed, vm.object_path)))
+
+    def _watched_changed(self, vm_path, _, changed_properties,
+                         invalidated=None):
+        # pylint: disable=unused-argument
+        memory_usage = changed_properties.get('memory_usage')
+        if memory_usage is not None:
+            self.update(vm_path, int(memory_usage))
+
+    def discard(self, vm_path: dbus.ObjectPath) -> None:
+        ''' Stop counting the domain at `vm_path` '''
+        self.total -= self._memory.pop(vm_path, 0)
+        self.updates.push(self, self._apply, {})
+
+    def _apply(self, _changed_properties):
+        self.history.append(self._interval_peak)
+        self._interval_peak = self.total
+        self.label.set_text('Total: %d MB  Peak: %d MB  %s' % (
+            self.total // 1024, self.peak // 1024,
+            qui.history.sparkline(self.history, SPARKLINE_WIDTH)))
+
+
+class DomainGroups():
+    ''' Keeps the domain items of the tray menu sorted by one of the
+        `SORT_KEYS` and separated in groups by one of the `GROUP_KEYS`.
+        Inserting, removing and moving an item only touches its own group.
+    '''
+
+    def __init__(self, menu: Gtk.Menu, sort_by: str='name',
+                 group_by: str='none', offset: int=0) -> None:
+        ''' The first `offset` items of the `menu` are left alone '''
+        self.menu = menu
+        self.offset = offset
+        self._sort_key = SORT_KEYS[sort_by]
+        self._group_key = GROUP_KEYS[group_by]
+        self.sections = qui.sections.Sections()
+        self._groups = []  # type: List[Any]
+        # group -> the separator in front of it, the first group has none
+        self.separators = {}  # type: Dict[Any, Gtk.SeparatorMenuItem]
+        # object path -> (group, sort key)
+        self._keys = {}  # type: Dict[dbus.ObjectPath, Tuple[Any, Tuple]]
+
+    def key(self, vm) -> Tuple[Any, Tuple]:
+        ''' Returns the group and the sort key of the domain `vm` '''
+        return (self._group_key(vm),
+                (self._sort_key(vm), str(vm['name']), str(vm.object_path)))
+
+    def insert(self, vm, menu_item: Gtk.MenuItem) -> None:
+        ''' Insert the `menu_item` of `vm` at its place in the menu '''
+        group, key = self._keys[vm.object_path] = self.key(vm)
+        if group not in self.sections:
+            self._add_group(group)
+        self.menu.insert(menu_item,
+                         self.offset + self.sections.insert(group, key))
+
+    def remove(self, vm, menu_item: Gtk.MenuItem) -> None:
+        ''' Remove the `menu_item` of `vm` from the menu '''
+        group, key = self._keys.pop(vm.object_path)
+        self.sections.remove(group, key)
+        self.menu.remove(menu_item)
+        if not self.sections[group]:
+            self._remove_group(group)
+
+    def update_item(self, menu_item: 'DomainMenuItem') -> None:
+        ''' Move the `menu_item` if the place of its domain in the menu
+            changed.
+        '''
+        vm = menu_item.vm
+        if self.key(vm) != self._keys[vm.object_path]:
+            self.remove(vm, menu_item)
+            self.insert(vm, menu_item)
+
+    def _add_group(self, group: Any) -> None:
+        index = bisect.bisect_left(self._groups, group)
+        self._groups.insert(index, group)
+        position = self.sections.add_section(group, index)
+        if len(self._groups) == 1:
+            return
+        separator = Gtk.SeparatorMenuItem()
+        if index == 0:
+            # the former first group needs a separator now
+            self.separators[self._groups[1]] = separator
+        else:
+            self.separators[group] = separator
+        self.menu.insert(separator, self.offset + position)
+        separator.show()
+
+    def _remove_group(self, group: Any) -> None:
+        index = bisect.bisect_left(self._groups, group)
+        self.sections.remove_section(group)
+        del self._groups[index]
+        if not self._groups:
+            return
+        if index == 0:
+            # the new first group doesn't need its separator anymore
+            separator = self.separators.pop(self._groups[0])
+        else:
+            separator = self.separators.pop(group)
+        self.menu.remove(separator)
+        separator.destroy()
+
+
 class DomainTray(Gtk.Application):
     ''' A tray icon application listing all but halted domains. ” '''
 
-    def __init__(self, app_name):
+    def __init__(self, app_name,
+                 max_refresh_rate=qui.updates.DEFAULT_MAX_RATE, profile=None,
+                 sort_by='name', group_by='none'):
         super().__init__()
         self.name = app_name
+        if profile is None:
+            profile = qui.profiling.StartupProfile()
+        self.profile = profile
+        self.updates = qui.updates.UpdateCoalescer(max_refresh_rate)
+        self.notifier = qui.notify.Notifier(app_name)
         self.tray_menu = Gtk.Menu()
+        self.header = MemoryHeader(self.updates)
+        self.tray_menu.append(self.header)
+        self.tray_menu.append(Gtk.SeparatorMenuItem())
+        self.domain_groups = DomainGroups(self.tray_menu, sort_by, group_by,
+                                          offset=2)
         self.ind = indicator(self.tray_menu)
-        self.domain_manager = DomainManager()
-        self.signal_matches = {
-        }  # type: Dict[dbus.ObjectPath, List[DBusSignalMatch]]
+        self.domain_manager = qui.models.qubes.registry().domains
         self.menu_items = {}  # type: Dict[dbus.ObjectPath, Gtk.MenuItem]
 
         self.signal_callbacks = {
@@ -238,48 +539,68 @@ class DomainTray(Gtk.Application):
 
     def remove_menu(self, _, vm_path):
         ''' Remove the menu item for the specified domain from the tray'''
-        vm_widget = self.menu_items[vm_path]
-        self.tray_menu.remove(vm_widget)
-        del self.menu_items[vm_path]
+        vm_widget = self.menu_items.pop(vm_path)
+        self.updates.cancel(vm_widget)
+        self.header.discard(vm_path)
+        self.domain_groups.remove(vm_widget.vm, vm_widget)
+        # also removes its subscriptions
+        vm_widget.destroy()
 
     def update_domain_item(self, _, vm_path):
-        ''' Add/Replace the menu item with the started menu for the specified vm in the tray'''
-        if vm_path in self.menu_items:
-            self.remove_menu(None, vm_path)
-
+        ''' Add the menu item for the specified vm to the tray, or update the
+            existing one to the new state of the vm.
+        '''
         vm = self.domain_manager.children[vm_path]
-        domain_item = DomainMenuItem(vm)
-        subprocess.call([
-            'notify-send',
-            "Domain %s is %s" % (vm['name'], str(vm['state']).lower())
-        ])
-        self.tray_menu.add(domain_item)
-        self.menu_items[vm_path] = domain_item
+        if vm_path in self.menu_items:
+            self.menu_items[vm_path].update_state()
+        else:
+            domain_item = DomainMenuItem(vm, self.updates,
+                                         self.domain_groups.update_item,
+                                         self.header)
+            self.domain_groups.insert(vm, domain_item)
+            self.menu_items[vm_path] = domain_item
+            domain_item.show_all()
+        # Replaces the notification about the previous state of the domain
+        self.notifier.notify(
+            "Domain %s is %s" % (vm['name'], vm['state'].lower()), key=vm_path)
+
+    def populate(self):
+        ''' Add the items of all running domains at startup. The menu is
+            shown once after all items are added, no notifications are sent.
+        '''
+        for vm_path, vm in self.domain_manager.children.items():
+            if vm['name'] == 'dom0':
+                # not in the menu, but counted in the total memory usage
+                self.header.watch(vm)
+                continue
+            if vm['state'] == 'Halted':
+                continue
+            domain_item = DomainMenuItem(vm, self.updates,
+                                         self.domain_groups.update_item,
+                                         self.header)
+            self.domain_groups.insert(vm, domain_item)
+            self.menu_items[vm_path] = domain_item
         self.tray_menu.show_all()
 
     def run(self):  # pylint: disable=arguments-differ
         for signal_name, handler_function in self.signal_callbacks.items():
-            matcher = self.domain_manager.connect_to_signal(
-                signal_name, handler_function)
-
-            if signal_name not in self.signal_matches:
-                self.signal_matches[signal_name] = list()
+            qui.subscriptions.SUBSCRIPTIONS.add(
+                self, signal_name, self.domain_manager.connect_to_signal(
+                    signal_name, handler_function))
 
-            self.signal_matches[signal_name] += [matcher]
-
-        for vm_path, vm in self.domain_manager.children.items():
-            if vm['name'] == 'dom0' or vm['state'] == 'Halted':
-                continue
-            else:
-                self.update_domain_item(DOMAIN_MANAGER_INTERFACE, vm_path)
+        with self.profile.phase('model build'):
+            self.populate()
+        self.profile.first_render(self.profile.report)
 
-        self.connect('shutdown', self._disconnect_signals)
-        Gtk.main()
+        try:
+            Gtk.main()
+        finally:
+            # `Gtk.main()` doesn't emit the `shutdown` signal of the
+            # application
+            self._disconnect_signals()
 
-    def _disconnect_signals(self, _):
-        for matchers in self.signal_matches.values():
-            for matcher in matchers:
-                self.domain_manager.disconnect_signal(matcher)
+    def _disconnect_signals(self):
+        qui.subscriptions.SUBSCRIPTIONS.release(self)
 
 
 def indicator(tray_menu: Gtk.Menu) -> appindicator.Indicator:
@@ -294,7 +615,28 @@ def indicator(tray_menu: Gtk.Menu) -> appindicator.Indicator:
 
 def main():
     ''' main function '''
-    app = DomainTray('org.qubes.ui.tray.Domains')
+    profile = qui.profiling.StartupProfile()
+    profile.imports_done()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-refresh-rate', type=float,
+                        default=qui.updates.DEFAULT_MAX_RATE,
+                        help='maximum number of widget updates per second')
+    parser.add_argument('--sort-by', choices=sorted(SORT_KEYS),
+                        default='name', help='order of the domains')
+    parser.add_argument('--group-by', choices=sorted(GROUP_KEYS),
+                        default='none',
+                        help='separate the domains in groups')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the duration of the startup phases')
+    args = parser.parse_args()
+
+    profile.enabled = args.profile_startup
+    with profile.phase('bus sync'):
+        qui.models.qubes.registry().sync(('domains', 'labels'))
+
+    app = DomainTray('org.qubes.ui.tray.Domains',
+                     max_refresh_rate=args.max_refresh_rate, profile=profile,
+                     sort_by=args.sort_by, group_by=args.group_by)
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     return app.run()
 
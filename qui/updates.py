@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+''' Coalescing of property updates for widgets.
+
+Property changes are buffered per object and only the latest values are
+applied, at most `max_rate` times per second, from the GLib main loop.
+'''
+
+import collections
+import time
+
+from typing import Any, Callable, Dict, Hashable, Tuple  # pylint: disable=unused-import
+
+from gi.repository import GLib  # isort:skip
+
+DEFAULT_MAX_RATE = 4  # updates per second
+
+
+class UpdateCoalescer(object):
+    ''' Buffers property changes and applies them once per tick.
+
+        `applied` counts the property values handed to the callbacks, `dropped`
+        the values overwritten by a newer one before they were applied.
+    '''
+
+    def __init__(self, max_rate: float=DEFAULT_MAX_RATE) -> None:
+        super(UpdateCoalescer, self).__init__()
+        assert max_rate > 0
+        self.max_rate = max_rate
+        self.interval = 1.0 / max_rate
+        # key -> (callback, changed properties)
+        self._pending = collections.OrderedDict(
+        )  # type: Dict[Hashable, Tuple[Callable, Dict[str, Any]]]
+        self._source = None  # type: int
+        self._last_flush = 0.0
+        self.applied = 0
+        self.dropped = 0
+
+    def push(self, key: Hashable, callback: Callable,
+             changed_properties: Dict[str, Any]) -> None:
+        ''' Buffer `changed_properties` for `key`. On the next tick
+            `callback(changed_properties)` is called with the latest values.
+        '''
+        try:
+            _, pending = self._pending[key]
+        except KeyError:
+            self._pending[key] = (callback, dict(changed_properties))
+        else:
+            self.dropped += len(pending.keys() & changed_properties.keys())
+            pending.update(changed_properties)
+        self._schedule()
+
+    def cancel(self, key: Hashable) -> None:
+        ''' Forget the pending changes for `key`, e.g. when its widget is
+            removed.
+        '''
+        try:
+            _, pending = self._pending.pop(key)
+        except KeyError:
+            return
+        self.dropped += len(pending)
+
+    def flush(self) -> bool:
+        ''' Apply all pending changes now '''
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        self._flush()
+        return False
+
+    def _schedule(self) -> None:
+        if self._source is not None:
+            return
+        delay = self._last_flush + self.interval - time.monotonic()
+        if delay <= 0:
+            self._source = GLib.idle_add(self._flush)
+        else:
+            self._source = GLib.timeout_add(int(delay * 1000), self._flush)
+
+    def _flush(self) -> bool:
+        self._source = None
+        self._last_flush = time.monotonic()
+        pending, self._pending = self._pending, collections.OrderedDict()
+        for callback, changed_properties in pending.values():
+            self.applied += len(changed_properties)
+            callback(changed_properties)
+        return False  # remove the GLib source
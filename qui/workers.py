@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+''' Runs blocking calls, e.g. to `qubesadmin`, outside of the GTK thread. '''
+
+import collections
+import concurrent.futures
+import logging
+import time
+
+from typing import Any, Callable, Dict, Hashable  # pylint: disable=unused-import
+
+from gi.repository import GLib  # isort:skip
+
+DEFAULT_WORKERS = 4
+LATENCY_HISTORY = 100
+
+_LOG = logging.getLogger(__name__)
+
+
+class _Job():
+    ''' A call waiting for or running in a worker thread '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, name: str, func: Callable, args: tuple,
+                 on_done: Callable, on_error: Callable) -> None:
+        self.name = name
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.duration = 0.0
+
+
+class WorkerPool():
+    ''' A bounded pool of worker threads.
+
+        Jobs submitted with the same key run one after another, in the order
+        they were submitted. `on_done(result)` and `on_error(exception)` are
+        called in the GLib main loop. The durations of the last jobs are kept
+        in `latencies` by job name.
+    '''
+
+    def __init__(self, max_workers: int=DEFAULT_WORKERS) -> None:
+        super(WorkerPool, self).__init__()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self._queues = {}  # type: Dict[Hashable, collections.deque]
+        self.latencies = {}  # type: Dict[str, collections.deque]
+
+    def submit(self, key: Hashable, name: str, func: Callable, *args,
+               on_done: Callable=None, on_error: Callable=None) -> None:
+        ''' Queue `func(*args)` behind the other jobs for `key` '''
+        job = _Job(name, func, args, on_done, on_error)
+        queue = self._queues.get(key)
+        if queue is None:
+            self._queues[key] = collections.deque([job])
+            self._start(key, job)
+        else:
+            queue.append(job)
+
+    def pending(self, key: Hashable) -> int:
+        ''' Number of queued and running jobs for `key` '''
+        return len(self._queues.get(key, ()))
+
+    def shutdown(self) -> None:
+        ''' Stop accepting jobs, running jobs are not waited for '''
+        self._executor.shutdown(wait=False)
+
+    def _start(self, key: Hashable, job: _Job) -> None:
+        future = self._executor.submit(_run, job)
+        # Called in the worker thread, hand the result to the main loop
+        future.add_done_callback(
+            lambda future: GLib.idle_add(self._finished, key, job, future))
+
+    def _finished(self, key: Hashable, job: _Job,
+                  future: concurrent.futures.Future) -> bool:
+        history = self.latencies.get(job.name)
+        if history is None:
+            history = self.latencies[job.name] = collections.deque(
+                maxlen=LATENCY_HISTORY)
+        history.append(job.duration)
+
+        queue = self._queues[key]
+        queue.popleft()
+        if queue:
+            self._start(key, queue[0])
+        else:
+            del self._queues[key]
+
+        error = future.exception()
+        if error is not None:
+            if job.on_error is not None:
+                job.on_error(error)
+            else:
+                _LOG.error('%s failed: %s', job.name, error)
+        elif job.on_done is not None:
+            job.on_done(future.result())
+        return False  # remove the GLib source
+
+
+def _run(job: _Job) -> Any:
+    ''' Run `job` and record how long it took '''
+    start = time.monotonic()
+    try:
+        return job.func(*job.args)
+    finally:
+        job.duration = time.monotonic() - start
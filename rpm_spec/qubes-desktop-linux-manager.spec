@@ -103,8 +103,17 @@ gtk-update-icon-cache %{_datadir}/icons/Adwaita &>/dev/null || :
 %dir %{python3_sitelib}/qui/__pycache__
 %{python3_sitelib}/qui/__pycache__/*
 %{python3_sitelib}/qui/__init__.py
+%{python3_sitelib}/qui/admin.py
 %{python3_sitelib}/qui/decorators.py
 %{python3_sitelib}/qui/domains_table.py
+%{python3_sitelib}/qui/history.py
+%{python3_sitelib}/qui/logviewer.py
+%{python3_sitelib}/qui/notify.py
+%{python3_sitelib}/qui/profiling.py
+%{python3_sitelib}/qui/sections.py
+%{python3_sitelib}/qui/subscriptions.py
+%{python3_sitelib}/qui/updates.py
+%{python3_sitelib}/qui/workers.py
 
 %dir %{python3_sitelib}/qui/models/
 %dir %{python3_sitelib}/qui/models/__pycache__